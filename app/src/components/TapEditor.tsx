@@ -42,10 +42,51 @@ const CustomDocument = Document.extend({
   content: "heading block",
 });
 
+// Smallest single splice (in code points, as the server counts them) turning `before` into `after`
+const diffNote = (before: string, after: string) => {
+  const a = Array.from(before);
+  const b = Array.from(after);
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+  let end = 0;
+  while (end < a.length - start && end < b.length - start && a[a.length - 1 - end] === b[b.length - 1 - end]) end++;
+  return { offset: start, delete: a.length - start - end, insert: b.slice(start, b.length - end).join("") };
+};
+
+// Re-applies our edit (base -> mine) on top of the server's (base -> theirs); null when the two overlap
+const rebaseNote = (base: string, mine: string, theirs: string) => {
+  if (mine === base) return theirs;
+  if (theirs === base) return mine;
+  const local = diffNote(base, mine);
+  const remote = diffNote(base, theirs);
+  const text = Array.from(theirs);
+  if (local.offset + local.delete < remote.offset) {
+    text.splice(local.offset, local.delete, ...Array.from(local.insert));
+  } else if (remote.offset + remote.delete < local.offset) {
+    const shift = Array.from(remote.insert).length - remote.delete;
+    text.splice(local.offset + shift, local.delete, ...Array.from(local.insert));
+  } else {
+    return null;
+  }
+  return text.join("");
+};
+
+// Notes saved by older clients hold JSON-encoded HTML
+const parseNote = (raw: string) => {
+  try {
+    const parsed = JSON.parse(raw);
+    return typeof parsed === "string" ? parsed : raw;
+  } catch {
+    return raw;
+  }
+};
+
 const Tiptap = ({ user_id, note_id }: { user_id: string; note_id: string }) => {
   const [isLinkDialogOpen, setIsLinkDialogOpen] = useState(false);
   const [linkUrl, setLinkUrl] = useState("");
   const [isProcessing, setIsProcessing] = useState(false);
+  // The server's copy of the note when our edit overlaps one made elsewhere
+  const [conflict, setConflict] = useState<{ content: string; version: number } | null>(null);
 
   const router = useRouter();
   const editor:any = useEditor({
@@ -90,14 +131,72 @@ const Tiptap = ({ user_id, note_id }: { user_id: string; note_id: string }) => {
     },
   });
 
+  // Last content the server confirmed, so saves only send what changed
+  const saved = useRef<{ content: string; version: number }>({ content: "", version: 0 });
+  const saveChain = useRef<Promise<void>>(Promise.resolve());
+  // The debounced save is created once, so it reads the editor and conflict state through refs
+  const editorRef = useRef<any>(null);
+  editorRef.current = editor;
+  const conflictRef = useRef(false);
+
+  const showConflict = (latest: { content: string; version: number } | null) => {
+    conflictRef.current = latest !== null;
+    setConflict(latest);
+  };
+
+  const saveNote = async (content: string) => {
+    const { content: base, version } = saved.current;
+    if (content === base || conflictRef.current) return;
+    try {
+      const resp = await axiosInstance.post(`/api/add_to_note`, {
+        note_id,
+        user_id,
+        expected_version: version,
+        patch: diffNote(base, content),
+      });
+      saved.current = { content, version: resp.data.version };
+    } catch (err: any) {
+      if (err?.response?.status !== 409) throw err;
+      // Appends made since `base` (e.g. from chat) are kept by the server and do
+      // not cause a 409; this is an edit made elsewhere, so merge with it first
+      await rebaseOnLatest(base);
+    }
+  };
+
+  const rebaseOnLatest = async (base: string) => {
+    const resp = await axiosInstance.post(`/api/get-note`, { user_id, note_id });
+    const latest = { content: resp.data.note_content, version: resp.data.version ?? 0 };
+    const editor = editorRef.current;
+    const merged = rebaseNote(base, editor.getHTML(), latest.content);
+    if (merged === null) {
+      showConflict(latest);
+      return;
+    }
+    saved.current = latest;
+    editor.commands.setContent(parseNote(merged));
+    // Saves the merged text as a patch against the server's version
+    debouncedSave(editor.getHTML());
+  };
+
+  const keepLatest = () => {
+    if (!conflict) return;
+    saved.current = conflict;
+    showConflict(null);
+    editor.commands.setContent(parseNote(conflict.content));
+  };
+
+  const keepMine = () => {
+    if (!conflict) return;
+    // Still conditional on the version we just read, so a newer edit raises the conflict again
+    saved.current = conflict;
+    showConflict(null);
+    debouncedSave(editor.getHTML());
+  };
+
   const debouncedSave = useRef(
     debounce((content: any) => {
-      axiosInstance
-        .post(`/api/add_to_note`, {
-          note_id,
-          text: content,
-          user_id,
-        })
+      saveChain.current = saveChain.current
+        .then(() => saveNote(content))
         .catch((err) => console.error("Failed to update note:", err));
     }, 500)
   ).current;
@@ -107,14 +206,8 @@ const Tiptap = ({ user_id, note_id }: { user_id: string; note_id: string }) => {
     axiosInstance
       .post(`/api/get-note`, { user_id, note_id })
       .then((resp) => {
-        let content = "New Note";
-        try {
-          content = JSON.parse(resp.data.note_content);
-        } catch (error) {
-          console.error("Failed to parse content:", error);
-          content = resp.data.note_content;
-        }
-        editor.commands.setContent(content);
+        saved.current = { content: resp.data.note_content, version: resp.data.version ?? 0 };
+        editor.commands.setContent(parseNote(resp.data.note_content));
       })
       .catch(() => {
         router.push("/");
@@ -424,6 +517,25 @@ const Tiptap = ({ user_id, note_id }: { user_id: string; note_id: string }) => {
         </DialogContent>
       </Dialog>
 
+      <Dialog open={conflict !== null}>
+        <DialogContent className="sm:max-w-[425px]">
+          <DialogHeader>
+            <DialogTitle>Note changed elsewhere</DialogTitle>
+            <DialogDescription>
+              This note was edited in another window while you were typing, and the two edits overlap.
+            </DialogDescription>
+          </DialogHeader>
+          <DialogFooter>
+            <Button variant="outline" onClick={keepLatest}>
+              Load latest
+            </Button>
+            <Button onClick={keepMine}>
+              Keep mine
+            </Button>
+          </DialogFooter>
+        </DialogContent>
+      </Dialog>
+
       <EditorContent
         className={`z-50 relative ${isProcessing ? "pointer-events-none animate-pulse" : "pointer-events-auto"} p-0 m-0`}
         editor={editor}
@@ -0,0 +1,21 @@
+-- Append-only chat message log, replacing the chat.chat_content JSON array.
+create table if not exists public.chat_messages (
+    id bigint generated always as identity primary key,
+    chat_id uuid not null references public.chat (id) on delete cascade,
+    sender text not null,
+    message text not null,
+    created_at timestamptz not null default now()
+);
+
+-- Cursor pagination walks a chat's messages by id
+create index if not exists chat_messages_chat_id_id_idx on public.chat_messages (chat_id, id);
+
+-- Backfill existing conversations in their original order
+insert into public.chat_messages (chat_id, sender, message, created_at)
+select c.id,
+       m.value ->> 'sender',
+       m.value ->> 'message',
+       coalesce((m.value ->> 'timestamp')::timestamptz, c.created_at)
+from public.chat c
+cross join lateral jsonb_array_elements(coalesce(c.chat_content::jsonb, '[]'::jsonb)) with ordinality as m(value, position)
+order by c.id, m.position;
@@ -0,0 +1,20 @@
+-- chat_messages is exposed through PostgREST like every public table; only
+-- the owner of the parent chat may see or add its messages. The backend
+-- uses the service role, which bypasses RLS.
+alter table public.chat_messages enable row level security;
+
+create policy "Owners can read their chat messages"
+    on public.chat_messages for select
+    using (exists (
+        select 1 from public.chat c
+        where c.id = chat_messages.chat_id and c.user_id::text = auth.uid()::text
+    ));
+
+create policy "Owners can add messages to their chats"
+    on public.chat_messages for insert
+    with check (exists (
+        select 1 from public.chat c
+        where c.id = chat_messages.chat_id and c.user_id::text = auth.uid()::text
+    ));
+
+revoke all on public.chat_messages from anon;
@@ -0,0 +1,157 @@
+-- Delta-based note updates: appends become small fragment rows instead of
+-- rewriting the whole note, and every change bumps a version for
+-- optimistic concurrency checks.
+alter table public.notes add column if not exists version bigint not null default 0;
+
+create table if not exists public.note_fragments (
+    id bigint generated always as identity primary key,
+    note_id uuid not null references public.notes (id) on delete cascade,
+    content text not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists note_fragments_note_id_id_idx on public.note_fragments (note_id, id);
+
+-- Notes as readers see them: the compacted body followed by pending fragments
+create or replace view public.note_documents as
+select n.id,
+       n.user_id,
+       n.title,
+       n.created_at,
+       n.version,
+       n.note_content || coalesce(
+           (select string_agg(f.content, '' order by f.id)
+            from public.note_fragments f
+            where f.note_id = n.id),
+           ''
+       ) as note_content
+from public.notes n;
+
+-- Appends a fragment and returns the note's new version and pending fragment count.
+-- Returns no row if the note does not exist, or if p_expected_version is given
+-- and does not match.
+create or replace function public.append_note_fragment(
+    p_note_id uuid,
+    p_content text,
+    p_expected_version bigint default null
+)
+returns table (version bigint, fragments bigint)
+language plpgsql
+as $$
+declare
+    new_version bigint;
+begin
+    update public.notes n
+    set version = n.version + 1
+    where n.id = p_note_id
+      and (p_expected_version is null or n.version = p_expected_version)
+    returning n.version into new_version;
+
+    if new_version is null then
+        return;
+    end if;
+
+    insert into public.note_fragments (note_id, content) values (p_note_id, p_content);
+
+    return query
+    select new_version, (select count(*) from public.note_fragments f where f.note_id = p_note_id);
+end;
+$$;
+
+-- Replaces a note's content, discarding pending fragments. Returns the new
+-- version, or no row on a missing note or version mismatch.
+create or replace function public.replace_note_content(
+    p_note_id uuid,
+    p_content text,
+    p_expected_version bigint default null
+)
+returns table (version bigint)
+language plpgsql
+as $$
+declare
+    new_version bigint;
+begin
+    update public.notes n
+    set note_content = p_content,
+        version = n.version + 1
+    where n.id = p_note_id
+      and (p_expected_version is null or n.version = p_expected_version)
+    returning n.version into new_version;
+
+    if new_version is null then
+        return;
+    end if;
+
+    delete from public.note_fragments f where f.note_id = p_note_id;
+
+    return query select new_version;
+end;
+$$;
+
+-- Folds pending fragments into the note body. The note row is locked so a
+-- concurrent replace cannot interleave; fragments appended meanwhile have
+-- higher ids and are left for the next compaction. The version does not
+-- change because the visible content does not.
+create or replace function public.compact_note(p_note_id uuid)
+returns bigint
+language plpgsql
+as $$
+declare
+    last_id bigint;
+    folded text;
+begin
+    perform 1 from public.notes where id = p_note_id for update;
+
+    select max(f.id), string_agg(f.content, '' order by f.id)
+    into last_id, folded
+    from public.note_fragments f
+    where f.note_id = p_note_id;
+
+    if last_id is null then
+        return 0;
+    end if;
+
+    update public.notes set note_content = note_content || folded where id = p_note_id;
+    delete from public.note_fragments where note_id = p_note_id and id <= last_id;
+
+    return last_id;
+end;
+$$;
+
+-- Applies a splice (replace p_delete characters at p_offset with p_insert)
+-- inside the database, so an edit only ships the changed span. Pending
+-- fragments are folded in first so offsets refer to the full note. Returns
+-- the new version, or no row on a missing note, version mismatch or an
+-- out-of-range splice.
+create or replace function public.patch_note_content(
+    p_note_id uuid,
+    p_offset integer,
+    p_delete integer,
+    p_insert text,
+    p_expected_version bigint
+)
+returns table (version bigint)
+language plpgsql
+as $$
+declare
+    new_version bigint;
+begin
+    perform public.compact_note(p_note_id);
+
+    update public.notes n
+    set note_content = overlay(n.note_content placing p_insert from p_offset + 1 for p_delete),
+        version = n.version + 1
+    where n.id = p_note_id
+      and n.version = p_expected_version
+      and p_offset >= 0
+      and p_delete >= 0
+      and p_offset + p_delete <= char_length(n.note_content)
+    returning n.version into new_version;
+
+    if new_version is null then
+        return;
+    end if;
+
+    return query select new_version;
+end;
+$$;
@@ -0,0 +1,127 @@
+-- Follow-up to 20261018010000_note_fragments.sql.
+--
+-- 1. The note functions and the note_documents view were reachable by any
+--    anon-key client. The functions are now service-role only, and the view
+--    runs with the caller's rights so RLS on notes applies.
+-- 2. Edits no longer conflict with appends. content_version records the
+--    last change that was not an append. If nothing but appends happened
+--    since the client's base version, the client's text is a prefix of the
+--    note, so a patch or replace can be applied and the appended text kept.
+
+alter table public.notes add column if not exists content_version bigint not null default 0;
+update public.notes set content_version = version where content_version = 0;
+
+create or replace view public.note_documents with (security_invoker = true) as
+select n.id,
+       n.user_id,
+       n.title,
+       n.created_at,
+       n.version,
+       n.note_content || coalesce(
+           (select string_agg(f.content, '' order by f.id)
+            from public.note_fragments f
+            where f.note_id = n.id),
+           ''
+       ) as note_content
+from public.notes n;
+
+alter table public.note_fragments enable row level security;
+
+drop function if exists public.replace_note_content(uuid, text, bigint);
+drop function if exists public.patch_note_content(uuid, integer, integer, text, bigint);
+
+-- Replaces a note's content. Without p_expected_version the write is
+-- unconditional. With it, the write also succeeds if only appends happened
+-- since that version; the text appended after the client's first
+-- p_base_length characters is kept after the new content. Returns the new
+-- version, or no row on a missing note or a conflicting edit.
+create or replace function public.replace_note_content(
+    p_note_id uuid,
+    p_content text,
+    p_expected_version bigint default null,
+    p_base_length integer default null
+)
+returns table (version bigint)
+language plpgsql
+as $$
+declare
+    current_note public.notes%rowtype;
+    new_content text := p_content;
+begin
+    perform public.compact_note(p_note_id);
+
+    select * into current_note from public.notes n where n.id = p_note_id for update;
+    if not found then
+        return;
+    end if;
+
+    if p_expected_version is not null and current_note.version <> p_expected_version then
+        if p_base_length is null
+           or current_note.content_version > p_expected_version
+           or p_base_length > char_length(current_note.note_content) then
+            return;
+        end if;
+        new_content := p_content || substr(current_note.note_content, p_base_length + 1);
+    end if;
+
+    update public.notes n
+    set note_content = new_content,
+        version = n.version + 1,
+        content_version = n.version + 1
+    where n.id = p_note_id;
+
+    return query select current_note.version + 1;
+end;
+$$;
+
+-- Applies a splice against the client's base version. Appends made since
+-- that version are at the end of the note, after the client's text, so the
+-- splice still lines up. Returns the new version, or no row on a missing
+-- note, a conflicting edit or an out-of-range splice.
+create or replace function public.patch_note_content(
+    p_note_id uuid,
+    p_offset integer,
+    p_delete integer,
+    p_insert text,
+    p_expected_version bigint
+)
+returns table (version bigint)
+language plpgsql
+as $$
+declare
+    current_note public.notes%rowtype;
+begin
+    perform public.compact_note(p_note_id);
+
+    select * into current_note from public.notes n where n.id = p_note_id for update;
+    if not found
+       or current_note.content_version > p_expected_version
+       or current_note.version < p_expected_version
+       or p_offset < 0
+       or p_delete < 0
+       or p_offset + p_delete > char_length(current_note.note_content) then
+        return;
+    end if;
+
+    update public.notes n
+    set note_content = overlay(n.note_content placing p_insert from p_offset + 1 for p_delete),
+        version = n.version + 1,
+        content_version = n.version + 1
+    where n.id = p_note_id;
+
+    return query select current_note.version + 1;
+end;
+$$;
+
+-- Only the backend (service role) may call the note functions
+revoke execute on function public.append_note_fragment(uuid, text, bigint) from public, anon, authenticated;
+revoke execute on function public.replace_note_content(uuid, text, bigint, integer) from public, anon, authenticated;
+revoke execute on function public.patch_note_content(uuid, integer, integer, text, bigint) from public, anon, authenticated;
+revoke execute on function public.compact_note(uuid) from public, anon, authenticated;
+grant execute on function public.append_note_fragment(uuid, text, bigint) to service_role;
+grant execute on function public.replace_note_content(uuid, text, bigint, integer) to service_role;
+grant execute on function public.patch_note_content(uuid, integer, integer, text, bigint) to service_role;
+grant execute on function public.compact_note(uuid) to service_role;
+
+revoke all on public.note_documents from anon;
+revoke all on public.note_fragments from anon;
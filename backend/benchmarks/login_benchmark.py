@@ -0,0 +1,118 @@
+"""
+Login latency benchmark.
+
+Fires concurrent logins and reports p50/p99 latency and throughput, to help
+tune BCRYPT_ROUNDS and HASH_EXECUTOR_WORKERS.
+
+    # Against a running server
+    python benchmarks/login_benchmark.py http --url http://127.0.0.1:8000 \
+        --email bench@example.com --password secret --requests 200 --concurrency 20
+
+    # Only the bcrypt pool, at several cost factors
+    python benchmarks/login_benchmark.py local --rounds 10 11 12 --requests 200 --concurrency 20
+
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label: str, latencies: list, elapsed: float, errors: int):
+    print(
+        f"{label}: {len(latencies)} ok, {errors} errors, "
+        f"p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} ms, "
+        f"mean {statistics.mean(latencies) * 1000:.1f} ms, "
+        f"{len(latencies) / elapsed:.1f} req/s"
+    )
+
+
+async def drive(call, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started, errors
+
+
+async def bench_http(args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        async def call():
+            response = await client.post("/api/login", json={"email": args.email, "password": args.password})
+            response.raise_for_status()
+
+        latencies, elapsed, errors = await drive(call, args.requests, args.concurrency)
+    if latencies:
+        report(f"login (concurrency {args.concurrency})", latencies, elapsed, errors)
+    else:
+        print(f"All {errors} requests failed")
+
+
+async def bench_local(args):
+    from passlib.context import CryptContext  # type: ignore
+    from utils.executor import run_hash, hash_executor
+
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        password_hash = context.hash("benchmark-password")
+
+        async def call():
+            if not await run_hash(context.verify, "benchmark-password", password_hash):
+                raise RuntimeError("verify failed")
+
+        latencies, elapsed, errors = await drive(call, args.requests, args.concurrency)
+        if latencies:
+            report(f"bcrypt rounds={rounds} workers={hash_executor.max_workers}", latencies, elapsed, errors)
+        else:
+            print(f"bcrypt rounds={rounds}: all {errors} verifications failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    http = sub.add_parser("http", help="benchmark /api/login on a running server")
+    http.add_argument("--url", default="http://127.0.0.1:8000")
+    http.add_argument("--email", required=True)
+    http.add_argument("--password", required=True)
+
+    local = sub.add_parser("local", help="benchmark bcrypt verification on the hash pool")
+    local.add_argument("--rounds", type=int, nargs="+", default=[12])
+
+    for p in (http, local):
+        p.add_argument("--requests", type=int, default=200)
+        p.add_argument("--concurrency", type=int, default=20)
+
+    args = parser.parse_args()
+    asyncio.run(bench_http(args) if args.mode == "http" else bench_local(args))
+
+
+if __name__ == "__main__":
+    main()
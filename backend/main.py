@@ -3,7 +3,15 @@ from fastapi import FastAPI
 from routers.auth.auth_router import router as auth_router
 from routers.ingest.ingest_router import router as ingest_router
 from routers.service.service_router import router as service_router
+from routers.metrics.metrics_router import router as metrics_router
 from fastapi.middleware.cors import CORSMiddleware
+from service.ingest import embedding_batcher
+from utils.db import db
+from utils.executor import shutdown_executors
+from utils.http_client import http_clients
+from utils.process_pool import parse_pool
+from utils.job_queue import job_queue
+from utils.vector_store import vector_store_lock
 
 app = FastAPI()
 
@@ -20,6 +28,24 @@ app.add_middleware(
 app.include_router(auth_router, prefix="/api", tags=['auth'])
 app.include_router(ingest_router, prefix="/api", tags=['ingest'])
 app.include_router(service_router, prefix="/api", tags=['service'])
+app.include_router(metrics_router, prefix="/api", tags=['metrics'])
+
+
+@app.on_event("startup")
+async def startup():
+    vector_store_lock.acquire_shared()
+    await db.connect()
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop()
+    await embedding_batcher.stop()
+    await http_clients.aclose()
+    shutdown_executors()
+    parse_pool.shutdown()
+    vector_store_lock.release()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+from utils.db import db
+from utils.write_batcher import InsertBatcher
+
+# Messages from concurrent senders are appended in bulk
+message_writes = InsertBatcher("chat_messages")
+
+
+async def find(user_id: str, video_id: str) -> list:
+    response = await db.execute(
+        db.table("chat").select("id").eq("user_id", user_id).eq("video_id", video_id)
+    )
+    return response.data
+
+
+async def create(chat: dict) -> list:
+    response = await db.execute(db.table("chat").insert(chat))
+    return response.data
+
+
+async def append_message(chat_id: str, sender: str, message: str):
+    """Appends one message to the chat's log; cost does not depend on history length."""
+    return await message_writes.insert({"chat_id": chat_id, "sender": sender, "message": message})
+
+
+async def list_messages(chat_id: str, before: int = None, limit: int = 100) -> list:
+    """Returns up to `limit` messages older than the `before` cursor, newest first."""
+    query = (
+        db.table("chat_messages")
+        .select("id, sender, message, created_at")
+        .eq("chat_id", chat_id)
+    )
+    if before is not None:
+        query = query.lt("id", before)
+    response = await db.execute(query.order("id", desc=True).limit(limit))
+    return response.data
+
+
+async def list_all_messages(chat_id: str, before: int = None, page_size: int = 500) -> list:
+    """Returns every message older than `before`, newest first, fetched page by page."""
+    messages = []
+    while True:
+        page = await list_messages(chat_id, before=before, limit=page_size)
+        messages.extend(page)
+        if len(page) < page_size:
+            return messages
+        before = page[-1]["id"]
@@ -0,0 +1,110 @@
+from utils.db import db
+
+
+async def create(note: dict) -> list:
+    response = await db.execute(db.table('notes').insert(note))
+    return response.data
+
+
+async def list_for_user(user_id: str) -> list:
+    response = await db.execute(
+        db.table('notes').select('id, created_at, title, user_id').eq('user_id', user_id)
+    )
+    return response.data
+
+
+async def get(note_id: str, user_id: str) -> list:
+    response = await db.execute(
+        db.table('note_documents').select('*').eq('id', note_id).eq('user_id', user_id)
+    )
+    return response.data
+
+
+async def replace_content(note_id: str, note_content: str, expected_version: int = None, base_length: int = None):
+    """
+    Replaces the note's content.
+
+    With `expected_version`, text appended since that version (after the
+    first `base_length` characters) is kept after the new content.
+
+    Returns the new version, or None if the note does not exist or was
+    edited (not just appended to) since `expected_version`.
+    """
+    response = await db.execute(
+        db.rpc('replace_note_content', {
+            'p_note_id': note_id,
+            'p_content': note_content,
+            'p_expected_version': expected_version,
+            'p_base_length': base_length,
+        })
+    )
+    return response.data[0]['version'] if response.data else None
+
+
+async def append_fragment(note_id: str, text: str, expected_version: int = None):
+    """
+    Appends text to the note server-side; only the fragment is sent.
+
+    Returns `{"version", "fragments"}`, or None if the note does not exist or
+    its version no longer matches `expected_version`.
+    """
+    response = await db.execute(
+        db.rpc('append_note_fragment', {
+            'p_note_id': note_id,
+            'p_content': text,
+            'p_expected_version': expected_version,
+        })
+    )
+    return response.data[0] if response.data else None
+
+
+async def patch_content(note_id: str, offset: int, delete: int, insert: str, expected_version: int):
+    """
+    Replaces `delete` characters at `offset` with `insert`, server-side.
+
+    Appends made since `expected_version` do not conflict. Returns the new
+    version, or None if the note does not exist, was edited since
+    `expected_version` or the splice is out of range.
+    """
+    response = await db.execute(
+        db.rpc('patch_note_content', {
+            'p_note_id': note_id,
+            'p_offset': offset,
+            'p_delete': delete,
+            'p_insert': insert,
+            'p_expected_version': expected_version,
+        })
+    )
+    return response.data[0]['version'] if response.data else None
+
+
+async def compact(note_id: str) -> int:
+    """Folds pending fragments into the note body."""
+    response = await db.execute(db.rpc('compact_note', {'p_note_id': note_id}))
+    return response.data
+
+
+async def delete(note_id: str, user_id: str) -> list:
+    response = await db.execute(
+        db.table('notes').delete().eq('id', note_id).eq('user_id', user_id)
+    )
+    return response.data
+
+
+async def get_by_id(note_id: str):
+    response = await db.execute(
+        db.table('note_documents').select('id, user_id, title, note_content').eq('id', note_id).limit(1)
+    )
+    return response.data[0] if response.data else None
+
+
+async def list_with_content(user_id: str) -> list:
+    response = await db.execute(
+        db.table('note_documents').select('id, user_id, title, note_content').eq('user_id', user_id)
+    )
+    return response.data
+
+
+async def exists(note_id: str) -> bool:
+    response = await db.execute(db.table('notes').select('id').eq('id', note_id).limit(1))
+    return bool(response.data)
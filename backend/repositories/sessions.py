@@ -0,0 +1,31 @@
+from utils.db import db
+
+
+async def get_by_token(token: str):
+    """Returns the session for a token, or None if the token is unknown."""
+    response = await db.execute(
+        db.table("sessions")
+        .select("user_id, token")
+        .eq("token", token)
+        .limit(1)
+    )
+    return response.data[0] if response.data else None
+
+
+async def get_by_user(user_id: str) -> list:
+    response = await db.execute(
+        db.table("sessions").select("id, token").eq("user_id", user_id)
+    )
+    return response.data
+
+
+async def create(session: dict) -> list:
+    response = await db.execute(db.table('sessions').insert(session))
+    return response.data
+
+
+async def update_token(user_id: str, token: str) -> list:
+    response = await db.execute(
+        db.table("sessions").update({"token": token}).eq("user_id", user_id)
+    )
+    return response.data
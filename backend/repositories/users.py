@@ -0,0 +1,31 @@
+from utils.db import db
+
+
+async def find_by_email_or_username(email: str, username: str) -> list:
+    response = await db.execute(
+        db.table('users')
+        .select('id')
+        .or_(f"email.eq.{email},username.eq.{username}")
+    )
+    return response.data
+
+
+async def get_by_email(email: str) -> list:
+    response = await db.execute(
+        db.table("users")
+        .select("id, email, password_hash, username")
+        .eq("email", email)
+    )
+    return response.data
+
+
+async def get_by_id(user_id: str):
+    response = await db.execute(
+        db.table("users").select("id, email, username").eq("id", user_id).limit(1)
+    )
+    return response.data[0] if response.data else None
+
+
+async def create(user: dict) -> list:
+    response = await db.execute(db.table('users').insert(user))
+    return response.data
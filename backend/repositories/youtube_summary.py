@@ -0,0 +1,57 @@
+from utils.db import db
+from utils.write_batcher import InsertBatcher
+
+# Summary rows and user links from concurrent "add video" requests are written in bulk
+summary_writes = InsertBatcher('youtube_summary')
+link_writes = InsertBatcher('user_yt_video')
+
+
+async def find_by_video_id(video_id: str):
+    """Returns the stored summary row for a video, or None if there is none."""
+    response = await db.execute(
+        db.table('youtube_summary')
+        .select('*')
+        .eq('video_id', video_id)
+        .maybe_single()
+    )
+    return response.data if response else None
+
+
+async def get_details(video_id: str) -> dict:
+    response = await db.execute(
+        db.table('youtube_summary')
+        .select('id, title, thumbnail, transcript, video_id, summarized_text')
+        .eq('video_id', video_id)
+        .single()
+    )
+    return response.data
+
+
+async def create(summary: dict) -> list:
+    row = await summary_writes.insert(summary)
+    return [row] if row else []
+
+
+async def link_user(user_id: str, summary_id) -> list:
+    row = await link_writes.insert({"user_id": user_id, "video_id": summary_id})
+    return [row] if row else []
+
+
+async def list_for_user(user_id: str) -> list:
+    # Join user_yt_video with youtube_summary using video_id
+    response = await db.execute(
+        db.table('user_yt_video')
+        .select('youtube_summary(title, thumbnail, video_id)')
+        .eq('user_id', user_id)
+    )
+    return [entry["youtube_summary"] for entry in response.data] if response.data else []
+
+
+async def list_video_ids_for_user(user_id: str) -> list:
+    """Returns the YouTube IDs of every video linked to the user."""
+    response = await db.execute(
+        db.table('user_yt_video')
+        .select('youtube_summary(video_id)')
+        .eq('user_id', user_id)
+    )
+    return [entry["youtube_summary"]["video_id"] for entry in response.data or [] if entry.get("youtube_summary")]
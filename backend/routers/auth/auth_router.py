@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, Response, Request
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel, EmailStr
-from utils.supabase import supabase
+from repositories import sessions, users
+from utils.get_session_token import get_current_user
+from utils.session_cache import session_cache
 from passlib.context import CryptContext  # type: ignore
+from utils.executor import run_hash, run_io
+import os
 import uuid
 from datetime import datetime
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+)
 
 class RegisterRequest(BaseModel):
     email: EmailStr
@@ -30,23 +38,16 @@ class SessionResponse(BaseModel):
 @router.post("/register", response_model=UserResponse)
 async def register(request: RegisterRequest, response: Response):
     # Check if the email or username already exists
-    existing_user = (
-        supabase.table('users')
-        .select('id')
-        .or_(
-            f"email.eq.{request.email},username.eq.{request.username}"
-        )
-        .execute()
-    )
+    existing_user = await users.find_by_email_or_username(request.email, request.username)
 
-    if existing_user.data:
+    if existing_user:
         raise HTTPException(
             status_code=400,
             detail="Email or Username already exists"
         )
 
     # Hash the password
-    hashed_password = pwd_context.hash(request.password)
+    hashed_password = await run_hash(pwd_context.hash, request.password)
 
     # Create a new user
     new_user = {
@@ -55,11 +56,11 @@ async def register(request: RegisterRequest, response: Response):
         "username": request.username
     }
     try:
-        user_response = supabase.table('users').insert(new_user).execute()
-        if not user_response.data:
+        user_response = await users.create(new_user)
+        if not user_response:
             raise HTTPException(status_code=500, detail="User creation failed")
 
-        user_id = user_response.data[0]['id']
+        user_id = user_response[0]['id']
 
         # Create a session token
         session_token = str(uuid.uuid4())
@@ -69,8 +70,8 @@ async def register(request: RegisterRequest, response: Response):
             "token": session_token,
             "last_login": datetime.utcnow().isoformat()
         }
-        session_response = supabase.table('sessions').insert(session_data).execute()
-        if not session_response.data:
+        session_response = await sessions.create(session_data)
+        if not session_response:
             raise HTTPException(status_code=500, detail="Session creation failed")
 
         # Set the session token as a cookie
@@ -87,34 +88,9 @@ async def register(request: RegisterRequest, response: Response):
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/session", response_model=SessionResponse)
-async def validate_session(request: Request):
-    # Retrieve the session token from cookies
-    session_token = request.cookies.get("session-token")
-    if not session_token:
-        raise HTTPException(status_code=401, detail="Session token is missing")
-
-    try:
-        # Fetch session details from the database
-        session_response = (
-            supabase.table("sessions")
-            .select("user_id, token")
-            .eq("token", session_token)
-            .single()
-            .execute()
-        )
-
-        user_id = session_response.data['user_id']
-
-        if user_id:
-            session_data = supabase.table("users").select("id, email, username").eq("id", user_id).single().execute()
-
-        if not session_response.data:
-            raise HTTPException(status_code=401, detail="Invalid or expired session token")
-
-        return session_data.data
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to validate session")
+async def validate_session(user: dict = Depends(get_current_user)):
+    # Resolved from the session cache, falling back to the database
+    return user
     
 
 @router.post("/login")
@@ -124,14 +100,7 @@ async def login_user(request: LoginRequest, response: Response):
 
     try:
         # Fetch user details from the database
-        user_response = (
-            supabase.table("users")
-            .select("id, email, password_hash, username")
-            .eq("email", email)
-            .execute()
-        )
-
-        user_data = user_response.data
+        user_data = await users.get_by_email(email)
 
         # Check if user exists
         if not user_data:
@@ -140,28 +109,24 @@ async def login_user(request: LoginRequest, response: Response):
         user_id = user_data[0]["id"]
 
         # Verify password
-        if not pwd_context.verify(password, user_data[0]["password_hash"]):
+        if not await run_hash(pwd_context.verify, password, user_data[0]["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         # Generate a new session token
         session_token = str(uuid.uuid4())
 
         # Check if a session exists for the user_id
-        session_response = (
-            supabase.table("sessions")
-            .select("id")
-            .eq("user_id", user_id)
-            .execute()
-        )
-
-        session_data = session_response.data
+        session_data = await sessions.get_by_user(user_id)
 
         if session_data:
             # Update the sessions table with the new token where user_id matches
-            supabase.table("sessions").update({"token": session_token}).eq("user_id", user_id).execute()
+            await sessions.update_token(user_id, session_token)
+
+            # The old token is no longer valid, so drop it from the cache
+            await run_io(session_cache.invalidate_user, user_id)
         else:
             # Insert a new session record
-            supabase.table("sessions").insert({"user_id": user_id, "token": session_token}).execute()
+            await sessions.create({"user_id": user_id, "token": session_token})
 
         # Set the session token in a cookie
         response.set_cookie(
@@ -175,4 +140,18 @@ async def login_user(request: LoginRequest, response: Response):
         return {"message": "Login successful", "user": {"email": user_data[0]["email"], "username": user_data[0]["username"]}}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to log in: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to log in: {str(e)}")
+
+
+@router.post("/logout")
+async def logout_user(response: Response, user: dict = Depends(get_current_user)):
+    try:
+        # Rotate the stored token so the old cookie can no longer be used
+        await sessions.update_token(user["id"], str(uuid.uuid4()))
+        await run_io(session_cache.invalidate_user, user["id"])
+
+        response.delete_cookie(key="session-token", httponly=True, secure=True)
+        return {"message": "Logout successful"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to log out: {str(e)}")
@@ -1,95 +1,77 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter #type: ignore
-from langchain.embeddings import SentenceTransformerEmbeddings #type: ignore
-from langchain_groq import ChatGroq #type: ignore
-import chromadb #type: ignore
 import os
-import fitz  # PyMuPDF #type: ignore
-from docx import Document #type: ignore
-from io import BytesIO
+from service.context_builder import build_context
+from service.ingest import video_shards, embedding_batcher, upload_directory, discard_file, SUPPORTED_CONTENT_TYPES
+from service.library_search import search_library
+from service.llm import llm
+from service.quiz import generate_quiz
 from utils.logger import logger
+from utils.executor import run_io
+from utils.chunk_refs import chunk_refs
+from utils.job_queue import job_queue
+from utils.quiz_store import quiz_store
+from utils.semantic_cache import semantic_cache
+from utils.sse import sse_event, SSE_HEADERS
+import shutil
 import uuid
-import re
-import json
 
 # Load environment variables
 load_dotenv()
 
 router = APIRouter()
 
-def extract_json(response_body: str):
-    try:
-        # Regex to find JSON enclosed within triple backticks or directly in the response
-        match = re.search(r'```json\n(.*?)\n```', response_body, re.DOTALL)
-        json_text = match.group(1) if match else response_body
-
-        # Parse the extracted JSON
-        return json.loads(json_text)
-    except (json.JSONDecodeError, AttributeError):
-        return None  # Return None if JSON extraction fails
-
-# Initialize ChromaDB with persistence
-persistence_directory = "./chroma_db"
-chroma_client = chromadb.PersistentClient(path=persistence_directory)
-
-collection_name = "axon-video"
-collection = chroma_client.get_or_create_collection(name=collection_name)
-
-# Initialize embedding function
-embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-
-# Initialize text splitter
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=100)
-
-# Initialize LLM
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0, max_retries=2)
-# llm = ChatGroq(model="deepseek-r1-distill-qwen-32b", temperature=0.0, max_retries=2)
-
-
-
-def clean_text(text: str) -> str:
-    """Remove null characters from the text."""
-    return text.replace('\x00', '')
+# How many chunks to retrieve before deduplication and re-ranking
+context_candidates = int(os.getenv("CONTEXT_CANDIDATES", 20))
 
 class IngestVideoRequest(BaseModel):
     user_id: str
     video_id: str
     transcript: str
+    priority: int = 0
+    incremental: bool = True
 
 class IngestFileRequest(BaseModel):
     user_id: str
+    priority: int = 0
+    incremental: bool = True
+    include_content: bool = False
 
 class QueryVideoRequest(BaseModel):
     video_id: str
     query: str
 
-@router.post("/ingestVideo")
-async def ingest_video(request: IngestVideoRequest):
-    user_id = request.user_id
-    video_id = request.video_id
-    transcript = clean_text(request.transcript)
-
-    # Split text into chunks
-    chunks = text_splitter.split_text(transcript)
-
-    # Generate embeddings
-    embeddings = embedding_function.embed_documents(chunks)
+class SearchRequest(BaseModel):
+    user_id: str
+    query: str
+    limit: int = Field(10, ge=1, le=50)
+    per_source: int = Field(3, ge=1, le=10)
 
-    # Generate unique IDs
-    ids = [str(uuid.uuid4()) for _ in chunks]
+class QuizRequest(BaseModel):
+    video_id: str
+    query: str = ""
+    page: int = Field(1, ge=1)
+    page_size: int = Field(50, ge=1, le=200)
+    regenerate: bool = False
 
-    # Store in ChromaDB
-    collection.upsert(
-        documents=chunks,
-        metadatas=[{"user_id": user_id, "video_id": video_id} for _ in chunks],
-        ids=ids,
-        embeddings=embeddings
+@router.post("/ingestVideo")
+async def ingest_video(request: IngestVideoRequest):
+    # Queue the transcript for a background worker
+    job_id = await job_queue.enqueue(
+        "ingest_video",
+        {
+            "user_id": request.user_id,
+            "video_id": request.video_id,
+            "transcript": request.transcript,
+            "incremental": request.incremental,
+        },
+        priority=request.priority,
     )
 
-    logger.info(f'Ingested {len(chunks)} document chunks for video {video_id}')
-    return {"status": "success"}
+    logger.info(f'Queued ingest job {job_id} for video {request.video_id}')
+    return {"status": "queued", "job_id": job_id}
 
 @router.post("/ingestFile")
 async def ingest_file(file: UploadFile = File(...), request: IngestFileRequest = Depends()):
@@ -99,85 +81,75 @@ async def ingest_file(file: UploadFile = File(...), request: IngestFileRequest =
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded.")
 
-    # Extract content based on file type
     content_type = file.content_type
+    if content_type not in SUPPORTED_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
+
+    # Spool the upload to disk so the worker can read it later
+    path = os.path.join(upload_directory, str(uuid.uuid4()))
     try:
-        if content_type == "text/plain":
-            content = await file.read()
-            text = content.decode("utf-8")
-        elif content_type == "application/pdf":
-            text = extract_pdf(file)
-        elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            text = extract_docx(file)
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
+        await run_io(save_upload, file, path)
     except Exception as e:
+        await run_io(discard_file, path)
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
-    text = clean_text(text)
-
-    # Split text into chunks
-    chunks = text_splitter.split_text(text)
-
-    # Generate embeddings
-    embeddings = embedding_function.embed_documents(chunks)
-
-    # Generate unique IDs
-    ids = [str(uuid.uuid4()) for _ in chunks]
-
-    # Store in ChromaDB
-    collection.upsert(
-        documents=chunks,
-        metadatas=[{"user_id": user_id} for _ in chunks],
-        ids=ids,
-        embeddings=embeddings
-    )
-
-    return {"file_name": file.filename, "content": text}
-
-def extract_pdf(file: UploadFile) -> str:
-    """Extract text from a PDF file using PyMuPDF."""
-    pdf_data = file.file.read()
-    pdf_document = fitz.open(stream=pdf_data, filetype="pdf")
-    text = "\n".join([page.get_text() for page in pdf_document])
-    pdf_document.close()
-    if not text:
-        raise HTTPException(status_code=500, detail="Error extracting text from PDF.")
-    return text
-
-def extract_docx(file: UploadFile) -> str:
-    """Extract text from a DOCX file using python-docx."""
-    doc_data = BytesIO(file.file.read())
-    document = Document(doc_data)
-    return "\n".join([para.text for para in document.paragraphs])
-
-@router.post("/queryVideo")
-async def query_video(request: QueryVideoRequest):
-    video_id = request.video_id
-    query = request.query
-
-    # Embed query
-    embedded_query = embedding_function.embed_query(query)
-
-    # Retrieve documents from ChromaDB
-    results = collection.query(
-        query_embeddings=[embedded_query],
-        n_results=20,
-        where={"video_id": video_id},
-    )
-
-    logger.info(results)
-
-    if not results["documents"]:
-        return {"response": "No relevant documents found."}
-
-    # Concatenate retrieved documents
-    context = " ".join(results["documents"][0])
-
-    logger.info(f'{context}')
-
-    # Generate response using the LLM
-    prompt = f"""You are an AI learning assistant called Axon. who provide accurate answers based on the given context.  
+    try:
+        job_id = await job_queue.enqueue(
+            "ingest_file",
+            {
+                "user_id": user_id,
+                "path": path,
+                "file_name": file.filename,
+                "content_type": content_type,
+                "incremental": request.incremental,
+                "include_content": request.include_content,
+            },
+            priority=request.priority,
+        )
+    except BaseException:
+        # No job owns the upload, so nothing else would delete it
+        await run_io(discard_file, path)
+        raise
+
+    logger.info(f'Queued ingest job {job_id} for file {file.filename}')
+    return {"file_name": file.filename, "status": "queued", "job_id": job_id}
+
+def save_upload(file: UploadFile, path: str):
+    """Copy an uploaded file to disk."""
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def retrieve_video_context(video_id: str, embedded_query: list):
+    """Returns the retrieved transcript context for a question, or None if nothing matched."""
+    # Retrieve documents from the video's shard (or the pre-sharding collection)
+    for candidate in await run_io(video_shards.collections_for, video_id):
+        results = await run_io(
+            candidate.query,
+            query_embeddings=[embedded_query],
+            n_results=context_candidates,
+            where={"video_id": video_id},
+            include=["documents", "embeddings"],
+        )
+        if results["documents"] and results["documents"][0]:
+            break
+    else:
+        return None
+
+    # Deduplicate, re-rank and pack the chunks into the token budget
+    context = build_context(embedded_query, results["documents"][0], results["embeddings"][0])
+
+    logger.info(f'Built context of {len(context)} chars from {len(results["documents"][0])} chunks')
+    return context
+
+def build_query_prompt(context: str, query: str) -> str:
+    return f"""You are an AI learning assistant called Axon. who provide accurate answers based on the given context.  
 Carefully examine the following text and generate a precise, well-structured response in markdown format.  
 
 ### Video Context:  
@@ -190,48 +162,110 @@ Carefully examine the following text and generate a precise, well-structured res
 - Provide a clear, concise, and informative response based on the given context.  
 - If the question is out of scope or the context does not provide sufficient information, respond appropriately by stating that the necessary details are not available in the provided video context.
 """
-    response = llm.invoke(prompt)
-
-    return {"response": response}
-
 
-@router.post("/querybymetadata")
+@router.post("/queryVideo")
 async def query_video(request: QueryVideoRequest):
-    video_id = request.video_id
-    query = request.query
-
     # Embed query
-    embedded_query = embedding_function.embed_query(query)
+    embedded_query = await embedding_batcher.embed_query(request.query)
 
-    # Retrieve documents from ChromaDB
-    results = collection.get(
-        where={"video_id": video_id},
-    )
+    # Answer near-identical questions about this video from the cache
+    version = await run_io(chunk_refs.source_version, request.video_id)
+    cached = semantic_cache.get(request.video_id, version, embedded_query)
+    if cached is not None:
+        return {"response": cached}
+
+    context = await retrieve_video_context(request.video_id, embedded_query)
 
-    if not results["documents"]:
+    if context is None:
         return {"response": "No relevant documents found."}
 
-    # Concatenate retrieved documents
-    context = " ".join(results["documents"][0])
+    # Generate response using the LLM
+    prompt = build_query_prompt(context, request.query)
+    response = await run_io(llm.invoke, prompt)
 
-    logger.info(f' No of documents:{len(results)}')
+    semantic_cache.set(request.video_id, version, embedded_query, response)
+    return {"response": response}
 
+@router.post("/queryVideo/stream")
+async def query_video_stream(request: QueryVideoRequest, http_request: Request):
+    embedded_query = await embedding_batcher.embed_query(request.query)
+
+    version = await run_io(chunk_refs.source_version, request.video_id)
+    cached = semantic_cache.get(request.video_id, version, embedded_query)
+    context = None
+    if cached is None:
+        context = await retrieve_video_context(request.video_id, embedded_query)
+
+    async def events():
+        if cached is not None:
+            yield sse_event({"token": cached.content})
+            yield sse_event({}, event="done")
+            return
+
+        if context is None:
+            yield sse_event({"token": "No relevant documents found."})
+            yield sse_event({}, event="done")
+            return
+
+        prompt = build_query_prompt(context, request.query)
+        stream = llm.astream(prompt)
+        answer = None
+        try:
+            async for chunk in stream:
+                # Stop generating as soon as the client goes away
+                if await http_request.is_disconnected():
+                    logger.info(f'Client disconnected, cancelling generation for video {request.video_id}')
+                    return
+                answer = chunk if answer is None else answer + chunk
+                if chunk.content:
+                    yield sse_event({"token": chunk.content})
+            if answer is not None:
+                semantic_cache.set(request.video_id, version, embedded_query, answer)
+            yield sse_event({}, event="done")
+        except Exception as e:
+            logger.error(f'Streaming query failed: {str(e)}')
+            yield sse_event({"detail": "Failed to generate a response."}, event="error")
+        finally:
+            # Closing the stream closes the upstream HTTP response to Groq
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
-    # Generate response using the LLM
-    prompt = f"""take all this data that you are given and i want you to prepare flash cards so you can quiz me on them, so generate questions based on the text, and also have options with it 1 of the options is the correct awnser and the others are fake, try to confuse the user by tricking them into thinking the other options could be right, but in reality they are not, get as technical as possible while coming up with the quiestions also try to cover every fact and details of the data provided. 
 
-### Data:  
-{context}  
+@router.post("/querybymetadata")
+async def query_by_metadata(request: QuizRequest):
+    video_id = request.video_id
 
-#### Instructions:  
-always try to return the response in nothing but JSON, so i can correctly parse the data.
-also always try and generate atleast a min of 10 questions.
-dont refer to the text given as data in the quiz.
-"correct" key should return type number
-"""
-    response = llm.invoke(prompt)
-    response.json()
-    extractedJson = extract_json(response.content)
+    # Serve the precomputed quiz; only call the LLM when there is none yet or
+    # the caller explicitly asks for a fresh one
+    quiz = None if request.regenerate else await run_io(quiz_store.latest, video_id)
+    if quiz is None:
+        quiz = await generate_quiz(video_id)
 
+    if quiz is None:
+        return {"response": "No relevant documents found."}
 
-    return {"response": extractedJson, "no_of_questions": len(extractedJson)}
\ No newline at end of file
+    questions = quiz["questions"]
+    start = (request.page - 1) * request.page_size
+    total_pages = (len(questions) + request.page_size - 1) // request.page_size
+
+    return {
+        "response": questions[start:start + request.page_size],
+        "no_of_questions": len(questions),
+        "version": quiz["version"],
+        "page": request.page,
+        "total_pages": total_pages,
+    }
+
+
+@router.post("/search")
+async def search(request: SearchRequest):
+    """Searches across all of the user's videos and files, grouped by source."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    results = await search_library(request.user_id, request.query, request.limit, request.per_source)
+    return {"results": results}
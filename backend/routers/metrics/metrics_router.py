@@ -0,0 +1,41 @@
+from fastapi import APIRouter
+from repositories import chat, youtube_summary
+from service.ingest import embedding_batcher, video_shards
+from service.video_metadata import metadata_cache
+from service.video_pipeline import video_flight
+from utils.db import db
+from utils.embedding_cache import embedding_cache
+from utils.http_client import http_clients
+from utils.executor import cpu_executor, io_executor, hash_executor
+from utils.process_pool import parse_pool
+from utils.semantic_cache import semantic_cache
+from utils.session_cache import session_cache
+from utils.summary_cache import summary_cache
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "executors": {
+            "cpu": cpu_executor.stats(),
+            "io": io_executor.stats(),
+            "hash": hash_executor.stats(),
+            "parse": parse_pool.stats(),
+        },
+        "db": db.stats(),
+        "http_clients": http_clients.stats(),
+        "write_batchers": {
+            "youtube_summary": youtube_summary.summary_writes.stats(),
+            "user_yt_video": youtube_summary.link_writes.stats(),
+            "chat_messages": chat.message_writes.stats(),
+        },
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "vector_shards": video_shards.stats(),
+        "session_cache": session_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "video_single_flight": video_flight.stats(),
+        "video_metadata_cache": metadata_cache.stats(),
+    }
@@ -1,9 +1,16 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from service.yt_transcript import addYoutubeTranscriptToVector, fetch_transcript_from_supabase, yt_summarize
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from service.video_metadata import get_metadata, get_metadata_bulk
+from service.video_pipeline import add_video_once
+from service.summarizer import summarize_stream
+from service.note_index import queue_note_sync, search_notes
+from service.note_updates import append_text, patch_text, replace_text
+from utils.db import is_foreign_key_violation
 from utils.logger import logger
-from utils.supabase import supabase
+from utils.sse import sse_event, SSE_HEADERS
+from repositories import chat, notes, youtube_summary
 from uuid import UUID, uuid4
 from datetime import datetime
 import yt_dlp #type: ignore
@@ -34,17 +41,10 @@ async def get_yt_transcript_api(request: SubtitleRequest):
         video_id = extract_video_id(request.video_url)
 
         # Check if the video_id already exists in the youtube_summary table
-        existing_data_response = (
-            supabase.table('youtube_summary')
-            .select('*')
-            .eq('video_id', video_id)
-            .maybe_single()
-            .execute()
-        )
+        existing_data = await youtube_summary.find_by_video_id(video_id)
 
-        if existing_data_response:
+        if existing_data:
             # If video_id exists, return the existing data
-            existing_data = existing_data_response.data
             logger.info(f'Existing data: {existing_data}')
             return {
                 "summary": existing_data['summarized_text'],
@@ -54,60 +54,12 @@ async def get_yt_transcript_api(request: SubtitleRequest):
                 "video_id": existing_data['video_id']
             }
 
-        # Fetch the transcript and metadata
-        result = await fetch_transcript_from_supabase(request.video_url)
-        video_summary = yt_summarize(result['transcript'])
-
-        logger.info(result['title'])
-
-        # Ensure all required fields are in the result
-        required_keys = ['transcript']
-        if all(key in result for key in required_keys) and result['transcript']:
-            logger.info(f'Result: {result}')
-            logger.info(f'Keys in result: {result.keys()}')
-
-            # Insert new data if the video_id does not exist
-            data = {
-                "title": result['title'],
-                "transcript": result['transcript'],
-                "video_id": video_id,
-                "summarized_text": video_summary
-            }
-
-            # Add to vector DB (make sure this function works asynchronously)
-            await addYoutubeTranscriptToVector(request.user_id, video_id, result['transcript'])
-
-            # Insert into Supabase table
-            response = supabase.table('youtube_summary').insert(data).execute()
-
-            logger.info(f"CREATED ENTRY: {response}")
-
-            if response is None:
-                error_message = response.error.message or 'Failed to insert data into Supabase'
-                logger.error(f'Supabase insert error: {error_message}')
-                raise RuntimeError(error_message)
-
-            # Handle user-yt-video relation
-            data2 = {"user_id": request.user_id, "video_id": response.data[0]['id']}
-            response_bridge = supabase.table('user_yt_video').insert(data2).execute()
-
-            if response_bridge is None:
-                error_message = response_bridge.error.message or 'Failed to link user and video.'
-                logger.error(f'Supabase bridge insert error: {error_message}')
-                raise RuntimeError(error_message)
-
-            logger.info('Data inserted successfully')
-
-            return {
-                "summary": video_summary,
-                "title": result['title'],
-                "transcript": result['transcript'],
-                "video_id": response.data[0]['id']
-            }
-        else:
-            logger.error('Missing required keys or empty transcript in the result')
-            raise HTTPException(status_code=400, detail="Missing required keys or empty transcript in the result")
+        # Summarize and ingest concurrently, then store the metadata. Concurrent
+        # requests for the same video wait on the same run.
+        return await add_video_once(request.video_url, video_id, request.user_id)
 
+    except HTTPException:
+        raise
     except ValueError as ve:
         logger.error(f'ValueError: {str(ve)}')
         raise HTTPException(status_code=400, detail=str(ve))
@@ -119,6 +71,36 @@ async def get_yt_transcript_api(request: SubtitleRequest):
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 
+@router.get("/video_metadata")
+async def get_video_metadata_api(video_url: str, fast: bool = True):
+    try:
+        video_id = extract_video_id(video_url)
+        metadata = await get_metadata(video_id, fast)
+        return {"video_id": video_id, **metadata}
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f'Metadata lookup failed: {str(e)}')
+        raise HTTPException(status_code=404, detail="Failed to fetch video metadata")
+
+class BulkMetadataRequest(BaseModel):
+    video_urls: List[str] = Field(..., max_length=500)
+    fast: bool = True
+
+@router.post("/video_metadata/bulk")
+async def get_video_metadata_bulk_api(request: BulkMetadataRequest):
+    video_ids = []
+    invalid = []
+    for video_url in request.video_urls:
+        try:
+            video_ids.append(extract_video_id(video_url))
+        except ValueError:
+            invalid.append(video_url)
+
+    metadata = await get_metadata_bulk(video_ids, request.fast)
+    return {"videos": metadata, "invalid_urls": invalid}
+
+
 class VideoSummary(BaseModel):
     title: str
     thumbnail: str
@@ -127,18 +109,7 @@ class VideoSummary(BaseModel):
 @router.get("/videos", response_model=list[VideoSummary])
 async def get_user_videos(user_id: str):
     try:
-        # Join user_yt_video with youtube_summary using video_id
-        response = (
-            supabase.table('user_yt_video')
-            .select('youtube_summary(title, thumbnail, video_id)')
-            .eq('user_id', user_id)
-            .execute()
-        )
-
-        if response.data:
-            return [entry["youtube_summary"] for entry in response.data]
-        else:
-            return []
+        return await youtube_summary.list_for_user(user_id)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch videos: {str(e)}")
@@ -155,16 +126,10 @@ class VideoDetails(BaseModel):
 async def get_video_details(video_id: str):
     try:
         # Fetch video details from the database
-        response = (
-            supabase.table('youtube_summary')
-            .select('id, title, thumbnail, transcript, video_id, summarized_text')
-            .eq('video_id', video_id)
-            .single()
-            .execute()
-        )
+        details = await youtube_summary.get_details(video_id)
 
-        if response.data:
-            return response.data
+        if details:
+            return details
         else:
             raise HTTPException(status_code=404, detail="Video not found")
 
@@ -178,11 +143,11 @@ class ChatInitRequest(BaseModel):
 @router.post("/initialize_chat")
 async def initialize_chat(request: ChatInitRequest):
     # Check if a chat with the same user_id and video_id exists
-    existing_chat = supabase.table("chat").select("id").eq("user_id", request.user_id).eq("video_id", request.video_id).execute()
+    existing_chat = await chat.find(request.user_id, request.video_id)
 
-    if existing_chat.data:
+    if existing_chat:
         # If a chat exists, return the existing chat_id
-        chat_id = existing_chat.data[0]["id"]
+        chat_id = existing_chat[0]["id"]
     else:
         # If no chat exists, create a new chat
         chat_id = str(uuid4())
@@ -193,8 +158,8 @@ async def initialize_chat(request: ChatInitRequest):
             "chat_content": [],
             "created_at": datetime.utcnow().isoformat()
         }
-        response = supabase.table("chat").insert(chat_data).execute()
-        if not response.data:
+        response = await chat.create(chat_data)
+        if not response:
             raise HTTPException(status_code=500, detail="Failed to initialize chat")
 
     return {"chat_id": chat_id}
@@ -207,36 +172,70 @@ class AddMessageRequest(BaseModel):
 
 @router.post("/add_message")
 async def add_message(request: AddMessageRequest):
-    # Fetch the current chat content
-    response = supabase.table("chat").select("chat_content").eq("id", request.chat_id).execute()
-    if response is None:
-        raise HTTPException(status_code=404, detail="Chat session not found")
-    chat_content = response.data[0]["chat_content"]
-
-    new_message = {
-        "sender": request.sender,
-        "message": request.message,
-        "timestamp": str(datetime.now())  # Replace with actual timestamp
-    }
-    
-    # Append the new message
-    chat_content.append(new_message)
-    
-    # Update the chat session with the new chat content
-    update_response = supabase.table("chat").update({"chat_content": chat_content}).eq("id", request.chat_id).execute()
-    if update_response is None:
+    # Append to the message log; no need to read the existing history
+    try:
+        new_message = await chat.append_message(request.chat_id, request.sender, request.message)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f'Failed to add message to chat {request.chat_id}: {str(e)}')
+        if is_foreign_key_violation(e):
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        raise HTTPException(status_code=500, detail="Failed to add message")
+    if not new_message:
         raise HTTPException(status_code=500, detail="Failed to add message")
     return {"message": "Message added successfully"}
 
 class ChatHistoryRequest(BaseModel):
-    chat_id: int
+    user_id: str
+    video_id: str
+    chat_id: Optional[str] = None
+    cursor: Optional[int] = None
+    # Omit to get the whole history, as before paging existed
+    limit: Optional[int] = Field(None, ge=1, le=500)
 
 @router.post("/get_chat_history")
-async def get_chat_history(request: ChatInitRequest):
-    response = supabase.table("chat").select("chat_content").eq("user_id", request.user_id).eq("video_id", request.video_id).execute()
-    if response is None:
-        raise HTTPException(status_code=404, detail="Chat session not found")
-    return {"chat_content": response.data[0]["chat_content"]}
+async def get_chat_history(request: ChatHistoryRequest):
+    chat_id = request.chat_id
+    if not chat_id:
+        existing_chat = await chat.find(request.user_id, request.video_id)
+        if not existing_chat:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        chat_id = existing_chat[0]["id"]
+
+    # Newest page first from the database, returned oldest-first like before
+    if request.limit is None:
+        messages = await chat.list_all_messages(chat_id, before=request.cursor)
+    else:
+        messages = await chat.list_messages(chat_id, before=request.cursor, limit=request.limit)
+    messages.reverse()
+
+    return {
+        "chat_content": [
+            {"sender": m["sender"], "message": m["message"], "timestamp": m["created_at"]}
+            for m in messages
+        ],
+        # Pass back as `cursor` to load older messages; None when there are no more
+        "next_cursor": messages[0]["id"] if request.limit and len(messages) == request.limit else None,
+    }
+
+class SummarizeRequest(BaseModel):
+    transcript: str
+
+@router.post("/summarize/stream")
+async def summarize_transcript_stream(request: SummarizeRequest):
+    async def events():
+        try:
+            async for event in summarize_stream(request.transcript):
+                if event["stage"] == "done":
+                    yield sse_event({"summary": event["summary"]}, event="done")
+                else:
+                    yield sse_event(event, event="progress")
+        except Exception as e:
+            logger.error(f'Streaming summary failed: {str(e)}')
+            yield sse_event({"detail": "Failed to summarize the transcript."}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @router.get("/test")
 async def test():
@@ -259,11 +258,12 @@ async def create_note(note: NoteCreate):
             "note_content": note.content,
             "created_at": datetime.utcnow().isoformat(),
         }
-        response = supabase.table('notes').insert(note_data).execute()
+        response = await notes.create(note_data)
 
-        if response is None:
+        if not response:
             raise HTTPException(status_code=500, detail="Failed to create note")
 
+        await queue_note_sync(str(note_id))
         return {"id": str(note_id), "folder_id": str(response), "title": note.title, "content": response, "created_at": note_data["created_at"]}
 
     except Exception as e:
@@ -279,13 +279,7 @@ class Note(BaseModel):
 async def get_user_notes(user_id: UUID):
     try:
         # Query the notes table for notes associated with the given user_id
-        response = supabase.table('notes').select('id, created_at, title, user_id').eq('user_id', str(user_id)).execute()
-
-        if response is None:
-            raise HTTPException(status_code=500, detail="Failed to fetch notes")
-
-        notes = response.data  # Assuming response.data contains the list of notes
-        return notes
+        return await notes.list_for_user(str(user_id))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -296,58 +290,53 @@ class Note(BaseModel):
     content: str
     user_id: str
 
+class NotePatch(BaseModel):
+    offset: int = Field(ge=0)
+    delete: int = Field(ge=0)
+    insert: str = ""
+
 class AddToNoteRequest(BaseModel):
     note_id: str
-    text: str
+    text: str = ""
     user_id: str
+    # The version the client last saw; when set, stale writes are rejected with 409
+    expected_version: Optional[int] = None
+    # Splice against `expected_version` instead of sending the whole note
+    patch: Optional[NotePatch] = None
+    # Length (in characters) of the client's copy at `expected_version`; lets a
+    # full replace keep text appended since then
+    base_length: Optional[int] = Field(None, ge=0)
 
 class GetUserNotesRequest(BaseModel):
     user_id: str
 
-def get_user_notes(user_id: str) -> List[Note]:
-    # Query notes from Supabase
-    response = supabase.table('notes').select('*').eq('user_id', user_id).execute()
-
-    if 'data' not in response:
-        raise HTTPException(status_code=404, detail="Notes not found")
-
-    notes = response['data']
-    return notes
-
 @router.post("/add_to_note")
 async def add_to_note(request: AddToNoteRequest):
-    note_id = request.note_id
-    text_to_add = request.text
-
-    padded_text = f'{text_to_add}'
-
-    if Note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-
-    supabase.table('notes').update({'note_content': padded_text}).eq('id', note_id).execute()
-    return {"saved"}
+    if request.patch is not None:
+        if request.expected_version is None:
+            raise HTTPException(status_code=400, detail="A patch requires expected_version")
+        version = await patch_text(
+            request.note_id,
+            request.patch.offset,
+            request.patch.delete,
+            request.patch.insert,
+            request.expected_version,
+        )
+    else:
+        version = await replace_text(request.note_id, request.text, request.expected_version, request.base_length)
+    return {"detail": "saved", "version": version}
 
 @router.post("/append_to_note")
-async def add_to_note(request: AddToNoteRequest):
-    note_id = request.note_id
-    text_to_add = request.text
-
-    padded_text = f'<br>{text_to_add}'
-    Note = supabase.table('notes').select({'note_content'}).eq('id', note_id).execute()
-
-    final_text = Note.data[0]['note_content'] + padded_text
-
-    if Note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-
-    supabase.table('notes').update({'note_content': final_text}).eq('id', note_id).execute()
-    return {"saved"}
+async def append_to_note(request: AddToNoteRequest):
+    version = await append_text(request.note_id, f'<br>{request.text}', request.expected_version)
+    return {"detail": "saved", "version": version}
 
 class Note(BaseModel):
     id: str
     user_id: str
     title: str
     note_content: str
+    version: int = 0
 
 class GetNoteRequest(BaseModel):
     user_id: str
@@ -358,9 +347,9 @@ async def get_note_endpoint(request: GetNoteRequest):
     user_id = request.user_id
     note_id = request.note_id
     try:
-        response = supabase.table('notes').select('*').eq('id', note_id).eq('user_id', user_id).execute()
-        if response.data:
-            return response.data[0]
+        response = await notes.get(note_id, user_id)
+        if response:
+            return response[0]
         else:
             raise HTTPException(status_code=404, detail="Note not found")
     except Exception as e:
@@ -376,15 +365,35 @@ async def delete_note_endpoint(request: DeleteNoteRequest):
     note_id = request.note_id
     try:
         # Check if the note exists and belongs to the user
-        response = supabase.table('notes').select('*').eq('id', note_id).eq('user_id', user_id).execute()
-        if not response.data:
+        response = await notes.get(note_id, user_id)
+        if not response:
             raise HTTPException(status_code=404, detail="Note not found")
 
         # Delete the note
-        delete_response = supabase.table('notes').delete().eq('id', note_id).eq('user_id', user_id).execute()
-        if delete_response.data:
+        delete_response = await notes.delete(note_id, user_id)
+        if delete_response:
+            await queue_note_sync(note_id)
             return {"detail": "Note deleted successfully"}
         else:
             raise HTTPException(status_code=500, detail="Error deleting note")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deleting note: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deleting note: {str(e)}")
+
+
+class SearchNotesRequest(BaseModel):
+    user_id: str
+    query: str
+    limit: int = Field(default=10, ge=1, le=50)
+
+@router.post("/search-notes")
+async def search_notes_endpoint(request: SearchNotesRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    try:
+        results = await search_notes(request.user_id, request.query, request.limit)
+        return {"results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f'Note search failed for user {request.user_id}: {str(e)}')
+        raise HTTPException(status_code=500, detail="Error searching notes")
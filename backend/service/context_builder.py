@@ -0,0 +1,105 @@
+from dotenv import load_dotenv
+from utils.chunk_refs import normalize_text
+import numpy as np
+import os
+
+load_dotenv()
+
+# Approximate tokens for budget purposes; avoids loading a tokenizer per request
+CHARS_PER_TOKEN = 4
+
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+duplicate_threshold = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.95))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _unit(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def deduplicate(documents: list, embeddings) -> list:
+    """
+    Returns the indexes of the documents to keep, dropping near-duplicates.
+
+    A chunk is dropped if its text is contained in an earlier chunk or its
+    embedding is almost identical to one (overlapping 600/100 chunks often are).
+    """
+    vectors = _unit(embeddings)
+    texts = [normalize_text(doc) for doc in documents]
+    keep = []
+    for i, text in enumerate(texts):
+        duplicate = False
+        for j in keep:
+            if text in texts[j] or float(vectors[i] @ vectors[j]) >= duplicate_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            keep.append(i)
+    return keep
+
+
+def mmr(query_embedding, embeddings, lambda_mult: float) -> list:
+    """Orders candidates by maximal marginal relevance to the query."""
+    query = _unit(query_embedding)
+    vectors = _unit(embeddings)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected = []
+    remaining = list(range(len(vectors)))
+    while remaining:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def build_context(query_embedding: list, documents: list, embeddings, token_budget: int = None,
+                  lambda_mult: float = None, separator: str = "\n\n") -> str:
+    """
+    Assembles prompt context from retrieved chunks.
+
+    Near-duplicate chunks are dropped, the rest are re-ranked with MMR and
+    packed in that order until the token budget is spent.
+
+    Args:
+        query_embedding (list): The question's embedding.
+        documents (list): Retrieved chunk texts.
+        embeddings: The chunks' embeddings, in the same order.
+        token_budget (int): Maximum approximate tokens of context.
+        lambda_mult (float): MMR trade-off; 1.0 is pure relevance.
+        separator (str): Placed between chunks.
+
+    Returns:
+        str: The packed context.
+    """
+    if not documents:
+        return ""
+    token_budget = token_budget or context_token_budget
+    lambda_mult = mmr_lambda if lambda_mult is None else lambda_mult
+
+    keep = deduplicate(documents, embeddings)
+    kept_embeddings = np.asarray(embeddings, dtype=np.float32)[keep]
+    order = [keep[i] for i in mmr(query_embedding, kept_embeddings, lambda_mult)]
+
+    packed = []
+    used = 0
+    for i in order:
+        cost = estimate_tokens(documents[i])
+        # Skip chunks that do not fit, a shorter one further down may
+        if used + cost > token_budget:
+            continue
+        packed.append(documents[i])
+        used += cost
+    return separator.join(packed)
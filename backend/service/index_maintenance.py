@@ -0,0 +1,44 @@
+"""
+Keeps FAISS indexes in sync with the stored vectors.
+
+Serving processes only read indexes; this command adds newly stored
+vectors to them (and rebuilds an index when it must be retrained). Run it
+once, or keep it running next to the API:
+
+    VECTOR_ENGINE=faiss python -m service.index_maintenance [--watch 60] [--full]
+"""
+import argparse
+import time
+from service.ingest import vector_client, vector_engine
+
+
+def sync_all(full: bool = False) -> dict:
+    outcomes = {}
+    for name in vector_client.list_collections():
+        collection = vector_client.get_or_create_collection(name=name)
+        if full or collection.needs_sync():
+            outcomes[name] = collection.sync_index(full=full)
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync FAISS indexes with stored vectors")
+    parser.add_argument("--full", action="store_true", help="Rebuild every index from scratch")
+    parser.add_argument("--watch", type=float, help="Keep running, checking every this many seconds")
+    args = parser.parse_args()
+
+    if vector_engine != "faiss":
+        print(f"VECTOR_ENGINE is {vector_engine!r}; only FAISS indexes need maintenance")
+        return
+
+    while True:
+        for name, outcome in sync_all(args.full).items():
+            print(f"{name}: {outcome or 'skipped, another process is syncing it'}")
+        if not args.watch:
+            break
+        args.full = False
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter #type: ignore
+from langchain.embeddings import SentenceTransformerEmbeddings #type: ignore
+from dotenv import load_dotenv
+from service.parsers import pdf_page_count, pdf_page_range, docx_paragraphs
+from utils.chunk_refs import chunk_refs, chunk_id
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_cache import CachedEmbeddings, embedding_cache
+from utils.executor import run_io
+from utils.job_queue import job_queue
+from utils.logger import logger
+from utils.process_pool import parse_pool
+from utils.shard_router import ShardRouter
+from utils.vector_store import create_vector_client
+import asyncio
+import hashlib
+import os
+
+load_dotenv()
+
+# Vector store engine (Chroma or FAISS), picked per deployment
+vector_engine = os.getenv("VECTOR_ENGINE", "chroma")
+vector_client = create_vector_client(vector_engine, os.getenv("VECTOR_DB_PATH"))
+
+# Video and file vectors are partitioned into shards by source; the original
+# single collection is only read until `python -m service.rebalance` empties it
+collection_name = "axon-video"
+video_shards = ShardRouter(
+    vector_client,
+    prefix=collection_name,
+    strategy=os.getenv("VECTOR_SHARD_STRATEGY", "bucket"),
+    buckets=int(os.getenv("VECTOR_SHARD_BUCKETS", 16)),
+    max_open=int(os.getenv("VECTOR_MAX_OPEN_SHARDS", 64)),
+    legacy_name=collection_name,
+)
+
+# Initialize embedding function, backed by the persistent embedding cache
+embedding_model_name = "all-MiniLM-L6-v2"
+embedding_function = CachedEmbeddings(
+    SentenceTransformerEmbeddings(model_name=embedding_model_name),
+    model_name=embedding_model_name,
+    cache=embedding_cache,
+)
+
+# Concurrent embed calls from ingest jobs and queries share batched forward passes
+embedding_batcher = EmbeddingBatcher(
+    embedding_function,
+    max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 64)),
+    max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5)),
+)
+
+# Initialize text splitter
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=100)
+
+# Chunks are embedded and upserted in batches of this size
+ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", 64))
+
+# PDFs are parsed in page ranges of this size, one range per worker process
+pdf_pages_per_task = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+# Uploaded files wait here until an ingest worker picks them up
+upload_directory = os.getenv("UPLOAD_DIR", "./uploads")
+os.makedirs(upload_directory, exist_ok=True)
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TEXT_CONTENT_TYPE = "text/plain"
+SUPPORTED_CONTENT_TYPES = (TEXT_CONTENT_TYPE, PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE)
+
+
+def clean_text(text: str) -> str:
+    """Remove null characters from the text."""
+    return text.replace('\x00', '')
+
+
+def iter_text_file(path: str, block_size: int = 64 * 1024):
+    """Yield a plain text file in fixed-size blocks."""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discard_file(path: str):
+    """Delete a spooled upload, if it is still there."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def aiter_sync(iterator):
+    """Advance a blocking iterator on the I/O executor, one item at a time."""
+    done = object()
+    while True:
+        item = await run_io(next, iterator, done)
+        if item is done:
+            break
+        yield item
+
+
+async def aiter_pdf_pages(path: str):
+    """
+    Yield the text of a PDF page by page, parsed in worker processes.
+
+    Page ranges are parsed in parallel across the parse pool, with only a
+    bounded number of ranges in flight so memory stays flat.
+    """
+    page_count = await parse_pool.run(pdf_page_count, path)
+    ranges = [(start, start + pdf_pages_per_task) for start in range(0, page_count, pdf_pages_per_task)]
+
+    pending = []
+    next_range = 0
+    while next_range < len(ranges) or pending:
+        while next_range < len(ranges) and len(pending) < parse_pool.max_workers:
+            start, end = ranges[next_range]
+            pending.append(asyncio.create_task(parse_pool.run(pdf_page_range, path, start, end)))
+            next_range += 1
+        try:
+            pages = await pending.pop(0)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+        for page in pages:
+            yield page
+
+
+async def aiter_docx_paragraphs(path: str):
+    """Yield the paragraphs of a DOCX file, parsed in a worker process."""
+    for paragraph in await parse_pool.run(docx_paragraphs, path):
+        yield paragraph
+
+
+def segment_separator(content_type: str) -> str:
+    """Plain text is read in fixed-size blocks, which must be joined back as they were."""
+    return "" if content_type == TEXT_CONTENT_TYPE else "\n"
+
+
+def aiter_segments(path: str, content_type: str):
+    if content_type == TEXT_CONTENT_TYPE:
+        return aiter_sync(iter_text_file(path))
+    elif content_type == PDF_CONTENT_TYPE:
+        return aiter_pdf_pages(path)
+    elif content_type == DOCX_CONTENT_TYPE:
+        return aiter_docx_paragraphs(path)
+    raise ValueError(f"Unsupported file type: {content_type}")
+
+
+async def iter_chunks(segments, window: int = 8 * 1024, separator: str = "\n"):
+    """
+    Split a stream of text segments into chunks without holding the whole text.
+
+    Segments are joined with `separator`, which belongs between logical
+    segments (pages, paragraphs); pass "" for segments that are arbitrary
+    slices of one text, such as blocks of a plain text file.
+
+    Segments are buffered until `window` characters are waiting; everything
+    but the last chunk is emitted and the last chunk carries over into the
+    next window, so chunks never straddle a window boundary.
+    """
+    buffer = ""
+    first = True
+    async for segment in segments:
+        buffer += ("" if first else separator) + clean_text(segment)
+        first = False
+        if len(buffer) >= window:
+            chunks = text_splitter.split_text(buffer)
+            for chunk in chunks[:-1]:
+                yield chunk
+            buffer = chunks[-1] if chunks else ""
+    if buffer.strip():
+        for chunk in text_splitter.split_text(buffer):
+            yield chunk
+
+
+async def store_chunks(chunks: list, source_id: str, metadata: dict, incremental: bool = True,
+                       target=None) -> tuple:
+    """
+    Embeds one batch of chunks and upserts it into the collection under deterministic IDs.
+
+    Args:
+        chunks (list): The chunk texts, in document order.
+        source_id (str): The video or file the chunks belong to.
+        metadata (dict): Metadata stored with every new vector.
+        incremental (bool): Only embed chunks that are not already stored.
+        target: The vector collection to write to; defaults to the source's shard.
+
+    Returns:
+        tuple: The chunk IDs, in order, and the number of chunks that were embedded.
+    """
+    target = target or await run_io(video_shards.for_source, source_id)
+    ids = [chunk_id(source_id, chunk) for chunk in chunks]
+
+    # Repeated chunks inside one batch collapse to a single vector
+    unique = {}
+    for cid, chunk in zip(ids, chunks):
+        unique.setdefault(cid, chunk)
+
+    if incremental and unique:
+        existing = await run_io(target.get, ids=list(unique), include=[])
+        for cid in existing["ids"]:
+            unique.pop(cid, None)
+
+    if unique:
+        new_ids = list(unique)
+        new_chunks = list(unique.values())
+
+        # Generate embeddings
+        embeddings = await embedding_batcher.embed_documents(new_chunks)
+
+        # Store in the vector store
+        await run_io(
+            target.upsert,
+            documents=new_chunks,
+            metadatas=[dict(metadata) for _ in new_chunks],
+            ids=new_ids,
+            embeddings=embeddings
+        )
+
+    return ids, len(unique)
+
+
+async def ingest_chunks(chunks, source_id: str, user_id: str, metadata: dict, incremental: bool = True) -> tuple:
+    """
+    Stores a stream of chunks in bounded batches and records the user's references.
+
+    Chunks the user referenced before but no longer does are deleted once no
+    other user references them either.
+
+    Returns:
+        tuple: The number of chunks and the number that were embedded.
+    """
+    ids = []
+    embedded = 0
+    batch = []
+    async for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= ingest_batch_size:
+            batch_ids, batch_embedded = await store_chunks(batch, source_id, metadata, incremental)
+            ids.extend(batch_ids)
+            embedded += batch_embedded
+            batch = []
+    if batch:
+        batch_ids, batch_embedded = await store_chunks(batch, source_id, metadata, incremental)
+        ids.extend(batch_ids)
+        embedded += batch_embedded
+
+    stale = await run_io(chunk_refs.set_refs, source_id, user_id, ids)
+    if stale:
+        # Chunks that dropped out of this re-ingest and nobody else references
+        for collection in await run_io(video_shards.collections_for, source_id):
+            await run_io(collection.delete, ids=stale)
+        logger.info(f'Deleted {len(stale)} stale chunks of source {source_id}')
+    return len(ids), embedded
+
+
+async def _single(text: str):
+    yield text
+
+
+async def ingest_video(user_id: str, video_id: str, transcript: str, incremental: bool = True) -> dict:
+    """
+    Chunks, embeds and stores a video transcript.
+
+    Args:
+        user_id (str): The user who added the video.
+        video_id (str): The YouTube video ID.
+        transcript (str): The transcript text.
+        incremental (bool): Only embed chunks that are not already stored.
+
+    Returns:
+        dict: The number of chunks in the transcript and how many were newly embedded.
+    """
+    count, embedded = await ingest_chunks(
+        iter_chunks(_single(transcript)), video_id, user_id, {"video_id": video_id}, incremental
+    )
+
+    logger.info(f'Ingested {count} document chunks for video {video_id} ({embedded} new)')
+    return {"chunks": count, "embedded": embedded}
+
+
+async def ingest_file(user_id: str, path: str, file_name: str, content_type: str,
+                      incremental: bool = True, include_content: bool = False) -> dict:
+    """
+    Extracts, chunks, embeds and stores an uploaded file as a stream.
+
+    Pages (or paragraphs) are parsed in worker processes and embedded in
+    bounded batches, so memory does not grow with the size of the file and a
+    pathological document cannot stall the API process.
+
+    Args:
+        user_id (str): The user who uploaded the file.
+        path (str): Where the upload was spooled to disk.
+        file_name (str): The original file name.
+        content_type (str): The upload's MIME type.
+        incremental (bool): Only embed chunks that are not already stored.
+        include_content (bool): Also return the extracted text. This keeps the
+            whole text in memory, so leave it off for large files.
+
+    Returns:
+        dict: The file name, its content-derived file ID and chunk counts.
+    """
+    # Identical files share one ID, and therefore one set of vectors
+    file_id = (await run_io(file_hash, path))[:32]
+
+    content = []
+    segments = aiter_segments(path, content_type)
+    separator = segment_separator(content_type)
+
+    async def collect(segments):
+        async for segment in segments:
+            if include_content:
+                content.append(clean_text(segment))
+            yield segment
+
+    count, embedded = await ingest_chunks(
+        iter_chunks(collect(segments), separator=separator), file_id, user_id,
+        {"file_id": file_id, "file_name": file_name}, incremental
+    )
+    if count == 0:
+        raise RuntimeError(f"No text could be extracted from {file_name}.")
+
+    await run_io(discard_file, path)
+
+    logger.info(f'Ingested {count} document chunks for file {file_name} ({embedded} new)')
+    result = {"file_name": file_name, "file_id": file_id, "chunks": count, "embedded": embedded}
+    if include_content:
+        result["content"] = separator.join(content)
+    return result
+
+
+async def ingest_video_and_queue_quiz(user_id: str, video_id: str, transcript: str, incremental: bool = True) -> dict:
+    """Ingests a transcript and, if it added new content, queues quiz generation."""
+    result = await ingest_video(user_id, video_id, transcript, incremental)
+
+    # New content means the stored quiz (if any) is stale; build one in the background
+    if result["embedded"]:
+        quiz_job_id = await job_queue.enqueue("generate_quiz", {"video_id": video_id}, priority=-1)
+        result["quiz_job_id"] = quiz_job_id
+    return result
+
+
+async def _ingest_video_job(payload: dict):
+    return await ingest_video_and_queue_quiz(
+        payload["user_id"], payload["video_id"], payload["transcript"], payload.get("incremental", True)
+    )
+
+
+async def _ingest_file_job(payload: dict):
+    return await ingest_file(
+        payload["user_id"], payload["path"], payload["file_name"], payload["content_type"],
+        payload.get("incremental", True), payload.get("include_content", False)
+    )
+
+
+async def _discard_upload(payload: dict):
+    # The last attempt failed, so nothing will read the spooled upload again
+    await run_io(discard_file, payload["path"])
+
+
+job_queue.register("ingest_video", _ingest_video_job)
+job_queue.register("ingest_file", _ingest_file_job, on_failed=_discard_upload)
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from repositories import youtube_summary
+from service.ingest import embedding_batcher, video_shards
+from service.video_metadata import get_metadata_bulk
+from utils.chunk_refs import chunk_refs
+from utils.executor import run_io
+from utils.logger import logger
+
+load_dotenv()
+
+# Upper bound on chunks retrieved per search before grouping by source
+max_search_candidates = int(os.getenv("LIBRARY_SEARCH_CANDIDATES", 100))
+
+
+def source_filter(source_ids: list) -> dict:
+    """
+    A vector store filter matching chunks of the given videos and files.
+
+    Both engines resolve metadata filters through an SQLite metadata index
+    before the vector search, so this stays proportional to the user's library
+    within the shard being searched.
+    """
+    return {"$or": [{"video_id": {"$in": source_ids}}, {"file_id": {"$in": source_ids}}]}
+
+
+async def search_library(user_id: str, query: str, limit: int = 10, per_source: int = 3) -> list:
+    """
+    Runs one vector search across every video and file in the user's library.
+
+    Args:
+        user_id (str): Whose library to search.
+        query (str): The search text.
+        limit (int): Maximum number of sources to return.
+        per_source (int): Maximum number of matching chunks per source.
+
+    Returns:
+        list: Sources ordered by their best match, each with its matching chunks.
+    """
+    # chunk_refs is the per-user index of sources; vectors are shared between users.
+    # Videos linked without an ingest of their own (another request ingested
+    # them, or they predate chunk_refs) are only known to user_yt_video.
+    ref_sources, linked_videos = await asyncio.gather(
+        run_io(chunk_refs.sources_for_user, user_id), youtube_summary.list_video_ids_for_user(user_id)
+    )
+    source_ids = list(dict.fromkeys(ref_sources + linked_videos))
+    if not source_ids:
+        return []
+
+    embedded_query = await embedding_batcher.embed_query(query)
+    n_results = min(limit * per_source * 2, max_search_candidates)
+
+    async def query_shard(target, shard_sources):
+        results = await run_io(
+            target.query,
+            query_embeddings=[embedded_query],
+            n_results=n_results,
+            where=source_filter(shard_sources),
+            include=["documents", "metadatas", "distances"],
+        )
+        if not results["ids"] or not results["ids"][0]:
+            return []
+        return list(zip(results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]))
+
+    # Only the shards holding the user's sources are searched, in parallel
+    searches = [
+        query_shard(await run_io(video_shards.collection, name), shard_sources)
+        for name, shard_sources in video_shards.group_by_shard(source_ids).items()
+    ]
+    legacy = await run_io(video_shards.legacy)
+    if legacy is not None:
+        searches.append(query_shard(legacy, source_ids))
+
+    hits = [hit for shard_hits in await asyncio.gather(*searches) for hit in shard_hits]
+    if not hits:
+        return []
+    hits = sorted(hits, key=lambda hit: hit[3])[:n_results]
+
+    positions = await run_io(chunk_refs.positions, [hit[0] for hit in hits])
+
+    groups = {}
+    for cid, document, metadata, distance in hits:
+        if metadata.get("video_id"):
+            source_id, kind = metadata["video_id"], "video"
+        else:
+            source_id, kind = metadata.get("file_id"), "file"
+        group = groups.setdefault(source_id, {
+            "source_id": source_id,
+            "type": kind,
+            "title": metadata.get("file_name"),
+            "score": 1 - distance,
+            "matches": [],
+        })
+        if len(group["matches"]) >= per_source:
+            continue
+        group["matches"].append({
+            "text": document,
+            "score": 1 - distance,
+            "position": positions.get(cid),
+            # Only present for chunks ingested with timing information
+            "timestamp": metadata.get("start"),
+        })
+
+    # Results arrive best-first, so insertion order is already the ranking
+    ranked = list(groups.values())[:limit]
+
+    video_ids = [group["source_id"] for group in ranked if group["type"] == "video"]
+    if video_ids:
+        titles = await get_metadata_bulk(video_ids)
+        for group in ranked:
+            if group["type"] == "video" and titles.get(group["source_id"]):
+                group["title"] = titles[group["source_id"]].get("title")
+
+    logger.info(f'Library search for user {user_id} matched {len(ranked)} of {len(source_ids)} sources')
+    return ranked
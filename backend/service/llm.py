@@ -0,0 +1,23 @@
+from langchain_groq import ChatGroq #type: ignore
+from dotenv import load_dotenv
+import re
+import json
+
+# Load environment variables
+load_dotenv()
+
+# Initialize LLM
+llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0, max_retries=2)
+# llm = ChatGroq(model="deepseek-r1-distill-qwen-32b", temperature=0.0, max_retries=2)
+
+
+def extract_json(response_body: str):
+    try:
+        # Regex to find JSON enclosed within triple backticks or directly in the response
+        match = re.search(r'```json\n(.*?)\n```', response_body, re.DOTALL)
+        json_text = match.group(1) if match else response_body
+
+        # Parse the extracted JSON
+        return json.loads(json_text)
+    except (json.JSONDecodeError, AttributeError):
+        return None  # Return None if JSON extraction fails
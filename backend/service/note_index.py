@@ -0,0 +1,231 @@
+import html
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+from repositories import notes
+from service.ingest import vector_client, embedding_batcher, store_chunks, text_splitter
+from utils.executor import run_io
+from utils.job_queue import job_queue
+from utils.logger import logger
+
+load_dotenv()
+
+# Note chunks live in their own collection so video queries never see them
+notes_collection = vector_client.get_or_create_collection(name="axon-notes")
+
+# Reciprocal rank fusion constant for merging keyword and semantic rankings
+RRF_K = 60
+
+
+def html_to_text(content: str) -> str:
+    """Strip the editor's HTML so only the words get indexed."""
+    text = re.sub(r'<br\s*/?>|</p>|</div>|</li>|</h\d>', '\n', content or '', flags=re.IGNORECASE)
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return html.unescape(text)
+
+
+def fts_query(query: str) -> str:
+    """Quote each word so user input cannot break FTS5 query syntax."""
+    words = re.findall(r'\w+', query)
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+class NoteTextIndex:
+    """A local SQLite FTS5 inverted index over note titles and text."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                    note_id UNINDEXED, user_id UNINDEXED, title, content,
+                    tokenize = 'porter unicode61'
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_users (
+                    user_id TEXT PRIMARY KEY,
+                    indexed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def upsert(self, note_id: str, user_id: str, title: str, text: str):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM notes_fts WHERE note_id = ?", (note_id,))
+            conn.execute(
+                "INSERT INTO notes_fts (note_id, user_id, title, content) VALUES (?, ?, ?, ?)",
+                (note_id, user_id, title or "", text),
+            )
+            conn.execute("COMMIT")
+
+    def delete(self, note_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM notes_fts WHERE note_id = ?", (note_id,))
+
+    def mark_user_indexed(self, user_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_users (user_id, indexed_at) VALUES (?, ?)", (user_id, time.time())
+            )
+
+    def is_user_indexed(self, user_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT 1 FROM indexed_users WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def titles(self, note_ids: list) -> dict:
+        if not note_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in note_ids)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT note_id, title FROM notes_fts WHERE note_id IN ({placeholders})", list(note_ids)
+            ).fetchall()
+        return {row["note_id"]: row["title"] for row in rows}
+
+    def search(self, user_id: str, query: str, limit: int) -> list:
+        match = fts_query(query)
+        if not match:
+            return []
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT note_id, title, snippet(notes_fts, 3, '<b>', '</b>', '…', 16) AS snippet
+                FROM notes_fts
+                WHERE notes_fts MATCH ? AND user_id = ?
+                ORDER BY bm25(notes_fts, 0, 0, 5.0, 1.0)
+                LIMIT ?
+                """,
+                (match, user_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+note_text_index = NoteTextIndex(os.getenv("NOTE_INDEX_PATH", "./note_index/notes.db"))
+
+
+async def index_note(note_id: str, user_id: str, title: str, content: str):
+    """
+    Brings both indexes up to date with a note's current content.
+
+    The text index row is replaced; for the embedding index only chunks that
+    are new are embedded and chunks that disappeared are deleted.
+    """
+    text = html_to_text(content)
+    await run_io(note_text_index.upsert, note_id, user_id, title, text)
+
+    chunks = text_splitter.split_text(text)
+    new_ids, embedded = await store_chunks(
+        chunks, note_id, {"user_id": user_id, "note_id": note_id}, target=notes_collection
+    )
+
+    existing = await run_io(notes_collection.get, where={"note_id": note_id}, include=[])
+    stale = set(existing["ids"]) - set(new_ids)
+    if stale:
+        await run_io(notes_collection.delete, ids=list(stale))
+
+    logger.info(f'Indexed note {note_id}: {len(chunks)} chunks, {embedded} embedded, {len(stale)} removed')
+
+
+async def remove_note(note_id: str):
+    await run_io(note_text_index.delete, note_id)
+    await run_io(notes_collection.delete, where={"note_id": note_id})
+
+
+async def queue_note_sync(note_id: str):
+    """Schedules a background refresh of a note's index entries, unless one is already waiting."""
+    await job_queue.enqueue("sync_note_index", {"note_id": note_id}, priority=1, dedupe_key=note_id)
+
+
+async def _sync_note_job(payload: dict):
+    # Always index what is stored now, so jobs running out of order converge
+    note = await notes.get_by_id(payload["note_id"])
+    if note is None:
+        await remove_note(payload["note_id"])
+        return {"removed": True}
+    await index_note(note["id"], note["user_id"], note["title"], note["note_content"])
+    return {"indexed": True}
+
+
+async def _reindex_user_job(payload: dict):
+    user_notes = await notes.list_with_content(payload["user_id"])
+    for note in user_notes:
+        await index_note(note["id"], note["user_id"], note["title"], note["note_content"])
+    await run_io(note_text_index.mark_user_indexed, payload["user_id"])
+    return {"notes": len(user_notes)}
+
+
+async def search_notes(user_id: str, query: str, limit: int = 10) -> list:
+    """
+    Searches a user's notes by keywords and by meaning.
+
+    Keyword hits come from the FTS5 index (BM25), semantic hits from the
+    note embeddings; the two rankings are merged with reciprocal rank fusion.
+
+    Returns:
+        list: Ranked `{"note_id", "title", "snippet", "score"}` results.
+    """
+    if not await run_io(note_text_index.is_user_indexed, user_id):
+        # Notes written before the index existed are picked up in the background
+        await run_io(note_text_index.mark_user_indexed, user_id)
+        await job_queue.enqueue("reindex_user_notes", {"user_id": user_id})
+
+    keyword_hits = await run_io(note_text_index.search, user_id, query, limit * 2)
+
+    embedded_query = await embedding_batcher.embed_query(query)
+    semantic = await run_io(
+        notes_collection.query,
+        query_embeddings=[embedded_query],
+        n_results=limit * 2,
+        where={"user_id": user_id},
+        include=["documents", "metadatas"],
+    )
+
+    results = {}
+    for rank, hit in enumerate(keyword_hits):
+        results[hit["note_id"]] = {**hit, "score": 1 / (RRF_K + rank + 1)}
+
+    semantic_rank = 0
+    for document, metadata in zip(semantic["documents"][0], semantic["metadatas"][0]):
+        note_id = metadata["note_id"]
+        # Only the best chunk of each note counts
+        if note_id in results and results[note_id].get("semantic"):
+            continue
+        semantic_rank += 1
+        entry = results.setdefault(
+            note_id, {"note_id": note_id, "title": None, "snippet": document[:200], "score": 0.0}
+        )
+        entry["score"] += 1 / (RRF_K + semantic_rank)
+        entry["semantic"] = True
+
+    ranked = sorted(results.values(), key=lambda r: r["score"], reverse=True)[:limit]
+    missing = [r["note_id"] for r in ranked if r["title"] is None]
+    titles = await run_io(note_text_index.titles, missing)
+    for r in ranked:
+        if r["title"] is None:
+            r["title"] = titles.get(r["note_id"])
+    return [
+        {"note_id": r["note_id"], "title": r["title"], "snippet": r["snippet"], "score": r["score"]}
+        for r in ranked
+    ]
+
+
+job_queue.register("sync_note_index", _sync_note_job)
+job_queue.register("reindex_user_notes", _reindex_user_job)
@@ -0,0 +1,87 @@
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from repositories import notes
+from service.note_index import queue_note_sync
+from utils.job_queue import job_queue
+from utils.logger import logger
+
+load_dotenv()
+
+# Once this many appended fragments are pending, fold them into the note body
+compact_after_fragments = int(os.getenv("NOTE_COMPACT_AFTER_FRAGMENTS", 32))
+
+
+async def _rejected(note_id: str) -> HTTPException:
+    # The RPCs return no row both for a missing note and a conflicting edit
+    if not await notes.exists(note_id):
+        return HTTPException(status_code=404, detail="Note not found")
+    return HTTPException(status_code=409, detail=f"Note {note_id} has changed; reload and retry.")
+
+
+async def append_text(note_id: str, text: str, expected_version: int = None) -> int:
+    """
+    Appends text to a note without reading or rewriting the existing content.
+
+    Args:
+        note_id (str): The note to append to.
+        text (str): The text to append.
+        expected_version (int): If given, only append if the note is still at this version.
+
+    Returns:
+        int: The note's new version.
+
+    Raises:
+        HTTPException: 404 if the note is missing, 409 if its version has moved on.
+    """
+    result = await notes.append_fragment(note_id, text, expected_version)
+    if result is None:
+        raise await _rejected(note_id)
+
+    if result["fragments"] >= compact_after_fragments:
+        # One pending compaction folds every fragment, so appends share it
+        await job_queue.enqueue("compact_note", {"note_id": note_id}, dedupe_key=note_id)
+    await queue_note_sync(note_id)
+    return result["version"]
+
+
+async def replace_text(note_id: str, text: str, expected_version: int = None, base_length: int = None) -> int:
+    """
+    Replaces a note's content, keeping text appended since `expected_version`.
+
+    Raises:
+        HTTPException: 404 if the note is missing, 409 if it was edited since
+            `expected_version`.
+    """
+    version = await notes.replace_content(note_id, text, expected_version, base_length)
+    if version is None:
+        raise await _rejected(note_id)
+    await queue_note_sync(note_id)
+    return version
+
+
+async def patch_text(note_id: str, offset: int, delete: int, insert: str, expected_version: int) -> int:
+    """
+    Applies a single splice to a note, sending only the changed span.
+
+    Text appended since `expected_version` sits after the client's text, so
+    the splice is applied on top of it rather than rejected.
+
+    Raises:
+        HTTPException: 404 if the note is missing, 409 if it was edited since
+            `expected_version` or the splice does not fit the current content.
+    """
+    version = await notes.patch_content(note_id, offset, delete, insert, expected_version)
+    if version is None:
+        raise await _rejected(note_id)
+    await queue_note_sync(note_id)
+    return version
+
+
+async def _compact_note_job(payload: dict):
+    folded = await notes.compact(payload["note_id"])
+    logger.info(f'Compacted note {payload["note_id"]} up to fragment {folded}')
+    return {"folded_through": folded}
+
+
+job_queue.register("compact_note", _compact_note_job)
@@ -0,0 +1,29 @@
+import fitz  # PyMuPDF #type: ignore
+from docx import Document #type: ignore
+
+# These run inside parse worker processes, so keep this module free of heavy
+# imports (models, database clients).
+
+
+def pdf_page_count(path: str) -> int:
+    """Return the number of pages in a PDF."""
+    pdf_document = fitz.open(path)
+    try:
+        return pdf_document.page_count
+    finally:
+        pdf_document.close()
+
+
+def pdf_page_range(path: str, start: int, end: int) -> list:
+    """Extract the text of pages [start, end) of a PDF using PyMuPDF."""
+    pdf_document = fitz.open(path)
+    try:
+        return [pdf_document[i].get_text() for i in range(start, min(end, pdf_document.page_count))]
+    finally:
+        pdf_document.close()
+
+
+def docx_paragraphs(path: str) -> list:
+    """Extract the paragraphs of a DOCX file using python-docx."""
+    document = Document(path)
+    return [para.text for para in document.paragraphs]
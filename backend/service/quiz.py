@@ -0,0 +1,84 @@
+from dotenv import load_dotenv
+from service.ingest import video_shards
+from service.llm import llm, extract_json
+from utils.chunk_refs import chunk_refs
+from utils.executor import run_io
+from utils.job_queue import job_queue
+from utils.logger import logger
+from utils.quiz_store import quiz_store
+import os
+
+load_dotenv()
+
+# Keeps the quiz prompt inside the model's context window for long videos
+quiz_context_max_chars = int(os.getenv("QUIZ_CONTEXT_MAX_CHARS", 24000))
+
+
+def build_quiz_prompt(context: str) -> str:
+    return f"""take all this data that you are given and i want you to prepare flash cards so you can quiz me on them, so generate questions based on the text, and also have options with it 1 of the options is the correct awnser and the others are fake, try to confuse the user by tricking them into thinking the other options could be right, but in reality they are not, get as technical as possible while coming up with the quiestions also try to cover every fact and details of the data provided. 
+
+### Data:  
+{context}  
+
+#### Instructions:  
+always try to return the response in nothing but JSON, so i can correctly parse the data.
+also always try and generate atleast a min of 10 questions.
+dont refer to the text given as data in the quiz.
+"correct" key should return type number
+"""
+
+
+async def generate_quiz(video_id: str):
+    """
+    Generates a quiz set for a video with the LLM and stores it as a new version.
+
+    Args:
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        dict: The stored quiz, or None if the video has no chunks or the
+        model did not return parseable JSON.
+    """
+    source_version = await run_io(chunk_refs.source_version, video_id)
+
+    # Retrieve documents from the video's shard (or the pre-sharding collection)
+    for candidate in await run_io(video_shards.collections_for, video_id):
+        results = await run_io(
+            candidate.get,
+            where={"video_id": video_id},
+        )
+        if results["documents"]:
+            break
+    else:
+        return None
+
+    # Concatenate retrieved documents
+    context = " ".join(results["documents"])[:quiz_context_max_chars]
+
+    logger.info(f' No of documents:{len(results["documents"])}')
+
+    # Generate response using the LLM
+    response = await run_io(llm.invoke, build_quiz_prompt(context))
+    questions = extract_json(response.content)
+
+    # The model sometimes wraps the list, e.g. {"questions": [...]}
+    if isinstance(questions, dict):
+        questions = next((value for value in questions.values() if isinstance(value, list)), None)
+
+    if not isinstance(questions, list) or not questions:
+        logger.error(f'Quiz generation for video {video_id} returned no parseable questions')
+        return None
+
+    version = await run_io(quiz_store.save, video_id, source_version, questions)
+    logger.info(f'Stored quiz version {version} with {len(questions)} questions for video {video_id}')
+    return {"video_id": video_id, "version": version, "source_version": source_version, "questions": questions}
+
+
+async def _generate_quiz_job(payload: dict):
+    quiz = await generate_quiz(payload["video_id"])
+    if quiz is None:
+        raise RuntimeError(f"Quiz generation failed for video {payload['video_id']}")
+    return {"version": quiz["version"], "questions": len(quiz["questions"])}
+
+
+job_queue.register("generate_quiz", _generate_quiz_job)
@@ -0,0 +1,103 @@
+"""
+Moves vectors into the shards their sources route to.
+
+Run after first enabling sharding (to drain the old single collection) or
+after changing VECTOR_SHARD_STRATEGY / VECTOR_SHARD_BUCKETS:
+
+    python -m service.rebalance [--batch-size 500] [--dry-run]
+
+When switching VECTOR_ENGINE, copy the old engine's collections over first:
+
+    VECTOR_ENGINE=faiss python -m service.rebalance --import-from chroma --import-path ./chroma_db
+
+Vectors stored before chunk_refs tracked ownership carry the user in their
+metadata; `--backfill-refs` records refs for them so library search finds
+them.
+
+The API server must be stopped first: both hold the vector store lock, and
+whichever starts second refuses to run.
+"""
+import argparse
+from utils.vector_store import create_vector_client, vector_store_lock, VECTOR_ENGINES
+
+
+def import_collections(source, destination, batch_size: int) -> int:
+    """Copies every collection of another vector client into `destination`."""
+    copied = 0
+    for name in [getattr(c, "name", c) for c in source.list_collections()]:
+        current, target = source.get_or_create_collection(name=name), destination.get_or_create_collection(name=name)
+        offset = 0
+        while True:
+            page = current.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            target.upsert(
+                ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"]
+            )
+            offset += len(page["ids"])
+            copied += len(page["ids"])
+    return copied
+
+
+def backfill_refs(shards, refs, batch_size: int) -> int:
+    """
+    Records chunk refs for vectors whose metadata names their user and source.
+
+    Users who already have refs for a source are left alone. Returns the
+    number of (source, user) pairs that were added.
+    """
+    found = {}
+    names = [getattr(c, "name", c) for c in shards.client.list_collections()]
+    for name in [name for name in names if name == shards.legacy_name or shards.is_shard(name)]:
+        current = shards.collection(name)
+        offset = 0
+        while True:
+            page = current.get(limit=batch_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            for cid, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                source_id = metadata.get("video_id") or metadata.get("file_id")
+                if source_id and metadata.get("user_id"):
+                    found.setdefault((source_id, metadata["user_id"]), []).append(cid)
+            offset += len(page["ids"])
+
+    return sum(refs.add_refs_if_missing(source_id, user_id, ids) for (source_id, user_id), ids in found.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance vector shards")
+    parser.add_argument("--batch-size", type=int, default=500, help="Vectors read per page")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the vectors that would move")
+    parser.add_argument("--import-from", choices=VECTOR_ENGINES, help="Copy collections from another engine first")
+    parser.add_argument("--import-path", help="Data directory of the engine to import from")
+    parser.add_argument("--backfill-refs", action="store_true", help="Record chunk refs for vectors stored without them")
+    args = parser.parse_args()
+
+    # Lock before the store is opened, so a running server never shares it with this process
+    vector_store_lock.acquire_exclusive()
+    from service.index_maintenance import sync_all
+    from service.ingest import vector_client, vector_engine, video_shards
+    from utils.chunk_refs import chunk_refs
+
+    if args.import_from and not args.dry_run:
+        source = create_vector_client(args.import_from, args.import_path)
+        copied = import_collections(source, vector_client, args.batch_size)
+        print(f"Imported {copied} vectors from {args.import_from}")
+
+    result = video_shards.rebalance(batch_size=args.batch_size, dry_run=args.dry_run)
+    action = "would move" if args.dry_run else "moved"
+    print(f"Scanned {result['scanned']} vectors, {action} {result['moved']}")
+
+    if args.backfill_refs and not args.dry_run:
+        added = backfill_refs(video_shards, chunk_refs, args.batch_size)
+        print(f"Backfilled chunk refs for {added} sources")
+
+    if vector_engine == "faiss" and not args.dry_run:
+        # Index everything that was copied or moved in one pass, here rather than in the API
+        for name, outcome in sync_all().items():
+            print(f"{name}: index {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+import google.generativeai as genai #type: ignore
+from langchain.text_splitter import RecursiveCharacterTextSplitter #type: ignore
+from utils.executor import run_io
+from utils.logger import logger
+from utils.summary_cache import summary_cache
+
+load_dotenv()
+
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+summary_model_name = "gemini-1.5-flash"
+summary_model = genai.GenerativeModel(summary_model_name)
+
+MAP_PROMPT = 'Summarize the text, covering every fact, sentences while preserving as much detail as possible: '
+REDUCE_PROMPT = (
+    'The following are summaries of consecutive parts of one video. Combine them into a single summary, '
+    'covering every fact, sentences while preserving as much detail as possible: '
+)
+
+# Transcripts longer than one chunk are summarized part by part, then reduced
+summary_chunk_chars = int(os.getenv("SUMMARY_CHUNK_CHARS", 30000))
+summary_concurrency = asyncio.Semaphore(int(os.getenv("SUMMARY_CONCURRENCY", 4)))
+summary_max_levels = int(os.getenv("SUMMARY_MAX_LEVELS", 3))
+
+summary_splitter = RecursiveCharacterTextSplitter(chunk_size=summary_chunk_chars, chunk_overlap=0)
+
+
+async def summarize_text(prompt: str, text: str) -> str:
+    """Summarizes one piece of text, reusing a cached summary when there is one."""
+    key = summary_cache.key(summary_model_name, prompt, text)
+    cached = await run_io(summary_cache.get, key)
+    if cached is not None:
+        return cached
+
+    async with summary_concurrency:
+        response = await summary_model.generate_content_async(f'{prompt}{text}')
+
+    await run_io(summary_cache.set, key, response.text)
+    return response.text
+
+
+async def _summarize_all(prompt: str, texts: list):
+    """Summarizes the texts concurrently, yielding (index, summary) as each finishes."""
+    async def one(i, text):
+        return i, await summarize_text(prompt, text)
+
+    tasks = [asyncio.create_task(one(i, text)) for i, text in enumerate(texts)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def summarize_stream(transcript_text: str):
+    """
+    Hierarchically summarizes a transcript, yielding progress as it goes.
+
+    The transcript is split into chunks that are summarized concurrently (map),
+    then the partial summaries are combined (reduce). If the partials are still
+    too long they are split and summarized again, up to `summary_max_levels`.
+
+    Yields:
+        dict: Progress events `{"stage", "level", "done", "total"}`, then a
+        final `{"stage": "done", "summary"}`.
+    """
+    texts = summary_splitter.split_text(transcript_text)
+    if len(texts) <= 1:
+        summary = await summarize_text(MAP_PROMPT, transcript_text)
+        yield {"stage": "done", "summary": summary}
+        return
+
+    prompt = MAP_PROMPT
+    level = 0
+    while True:
+        partials = [None] * len(texts)
+        done = 0
+        async for i, summary in _summarize_all(prompt, texts):
+            partials[i] = summary
+            done += 1
+            yield {"stage": "map", "level": level, "done": done, "total": len(texts)}
+
+        combined = "\n\n".join(partials)
+        level += 1
+        if len(combined) <= summary_chunk_chars or level >= summary_max_levels:
+            break
+        texts = summary_splitter.split_text(combined)
+        prompt = REDUCE_PROMPT
+
+    logger.info(f'Reducing {len(partials)} partial summaries after {level} level(s)')
+    yield {"stage": "reduce", "level": level, "done": 0, "total": 1}
+    summary = await summarize_text(REDUCE_PROMPT, combined)
+    yield {"stage": "done", "summary": summary}
+
+
+async def summarize(transcript_text: str) -> str:
+    """Hierarchically summarizes a transcript and returns the final summary."""
+    async for event in summarize_stream(transcript_text):
+        if event["stage"] == "done":
+            return event["summary"]
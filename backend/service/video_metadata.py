@@ -0,0 +1,137 @@
+import asyncio
+import os
+import yt_dlp #type: ignore
+from dotenv import load_dotenv
+from utils.executor import run_io
+from utils.http_client import http_clients
+from utils.logger import logger
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+metadata_cache = TTLCache(
+    ttl=float(os.getenv("VIDEO_METADATA_TTL_SECONDS", 24 * 3600)),
+    max_entries=int(os.getenv("VIDEO_METADATA_MAX_ENTRIES", 10000)),
+)
+metadata_flight = SingleFlight()
+bulk_concurrency = int(os.getenv("VIDEO_METADATA_BULK_CONCURRENCY", 8))
+
+
+def get_video_metadata(video_url: str) -> dict:
+    """
+    Fetches the metadata for a YouTube video using yt-dlp.
+
+    Args:
+        video_url (str): The YouTube video URL.
+
+    Returns:
+        dict: A dictionary containing the video title and thumbnail URL.
+
+    Raises:
+        RuntimeError: If fetching metadata fails.
+    """
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    cookies_path = os.path.join(script_dir, 'cookies.txt')
+
+    ydl_opts = {
+        'quiet': True,
+        'cookiefile': cookies_path,
+        'username': os.getenv('YT_EMAIL'),
+        'password': os.getenv('YT_PASSWORD'),
+        'usenetrc': True
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(video_url, download=False)
+        title = info_dict.get('title', None)
+        thumbnail = info_dict.get('thumbnail', None)
+
+        if not title or not thumbnail:
+            raise RuntimeError("Failed to extract video metadata.")
+
+        return {
+            'title': title,
+            'thumbnail': thumbnail
+        }
+
+
+def video_url_for(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+async def fetch_oembed(video_id: str):
+    """
+    Reads the title and thumbnail from YouTube's oEmbed endpoint.
+
+    One small JSON request instead of a full yt-dlp extraction. Returns None
+    if the endpoint does not answer, so callers can fall back.
+    """
+    try:
+        response = await http_clients.request(
+            "youtube-oembed",
+            "GET",
+            "https://www.youtube.com/oembed",
+            params={"url": video_url_for(video_id), "format": "json"},
+        )
+    except Exception as e:
+        logger.warning(f'oEmbed lookup failed for {video_id}: {str(e)}')
+        return None
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if not data.get("title") or not data.get("thumbnail_url"):
+        return None
+    return {"title": data["title"], "thumbnail": data["thumbnail_url"]}
+
+
+async def _lookup(video_id: str, fast: bool) -> dict:
+    metadata = await fetch_oembed(video_id) if fast else None
+    if metadata is None:
+        # Full yt-dlp extraction, off the event loop
+        metadata = await run_io(get_video_metadata, video_url_for(video_id))
+    return metadata
+
+
+async def get_metadata(video_id: str, fast: bool = True) -> dict:
+    """
+    Returns the title and thumbnail for a video, cached per video_id.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        fast (bool): Try the lightweight oEmbed lookup before yt-dlp.
+
+    Returns:
+        dict: A dictionary containing the video title and thumbnail URL.
+
+    Raises:
+        RuntimeError: If fetching metadata fails.
+    """
+    cached = metadata_cache.get(video_id)
+    if cached is not None:
+        return cached
+
+    metadata, _ = await metadata_flight.do(video_id, lambda: _lookup(video_id, fast))
+    metadata_cache.set(video_id, metadata)
+    return metadata
+
+
+async def get_metadata_bulk(video_ids: list, fast: bool = True) -> dict:
+    """
+    Looks up many videos at once (e.g. a playlist import) with bounded concurrency.
+
+    Returns:
+        dict: video_id -> metadata, or None for videos that could not be resolved.
+    """
+    slots = asyncio.Semaphore(bulk_concurrency)
+
+    async def one(video_id):
+        async with slots:
+            try:
+                return video_id, await get_metadata(video_id, fast)
+            except Exception as e:
+                logger.error(f'Metadata lookup failed for {video_id}: {str(e)}')
+                return video_id, None
+
+    return dict(await asyncio.gather(*(one(video_id) for video_id in dict.fromkeys(video_ids))))
@@ -0,0 +1,132 @@
+import asyncio
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from repositories import youtube_summary
+from service.ingest import ingest_video_and_queue_quiz
+from service.yt_transcript import fetch_transcript_from_supabase, yt_summarize
+from utils.chunk_refs import chunk_refs
+from utils.executor import run_io
+from utils.job_queue import job_queue
+from utils.logger import logger
+from utils.single_flight import SingleFlight
+import os
+
+load_dotenv()
+
+# Concurrent requests for the same video share one fetch/summarize/ingest run.
+# "No transcript" answers are remembered so they are not retried on every click.
+video_flight = SingleFlight(
+    negative_ttl=float(os.getenv("VIDEO_NEGATIVE_CACHE_SECONDS", 600)),
+    is_negative=lambda exc: isinstance(exc, HTTPException) and exc.status_code in (400, 404),
+)
+
+
+async def ingest_in_process(user_id: str, video_id: str, transcript: str):
+    """
+    Ingests the transcript directly, falling back to a queued job on failure.
+
+    Ingestion failures never fail the "add video" request: the job queue
+    retries them in the background.
+    """
+    try:
+        return await ingest_video_and_queue_quiz(user_id, video_id, transcript)
+    except Exception as e:
+        logger.error(f'In-process ingest of video {video_id} failed, queueing a retry: {str(e)}')
+        job_id = await job_queue.enqueue(
+            "ingest_video", {"user_id": user_id, "video_id": video_id, "transcript": transcript}
+        )
+        return {"job_id": job_id}
+
+
+async def add_video(video_url: str, video_id: str, user_id: str) -> dict:
+    """
+    Fetches, summarizes, ingests and stores a new YouTube video.
+
+    Summarization and vector ingestion are independent, so they run
+    concurrently; the whole call takes roughly as long as the slower of the two.
+
+    Args:
+        video_url (str): The YouTube video URL.
+        video_id (str): The YouTube video ID.
+        user_id (str): The user adding the video.
+
+    Returns:
+        dict: The summary, title, transcript and stored video row ID.
+
+    Raises:
+        HTTPException: If the transcript is missing.
+        RuntimeError: If the video could not be stored.
+    """
+    # Fetch the transcript and metadata
+    result = await fetch_transcript_from_supabase(video_url)
+
+    # Ensure all required fields are in the result
+    if not result.get('transcript'):
+        logger.error('Missing required keys or empty transcript in the result')
+        raise HTTPException(status_code=400, detail="Missing required keys or empty transcript in the result")
+
+    logger.info(result['title'])
+    transcript = result['transcript']
+
+    ingest_task = asyncio.create_task(ingest_in_process(user_id, video_id, transcript))
+    try:
+        video_summary = await yt_summarize(transcript)
+    except BaseException:
+        # Without a summary the video is never stored, so its vectors are not wanted either
+        ingest_task.cancel()
+        await asyncio.gather(ingest_task, return_exceptions=True)
+        raise
+    await ingest_task
+
+    # Insert new data if the video_id does not exist
+    data = {
+        "title": result['title'],
+        "transcript": transcript,
+        "video_id": video_id,
+        "summarized_text": video_summary
+    }
+
+    # Insert into Supabase table (batched with concurrent requests)
+    created = await youtube_summary.create(data)
+
+    logger.info(f"CREATED ENTRY: {created}")
+
+    if not created:
+        error_message = 'Failed to insert data into Supabase'
+        logger.error(f'Supabase insert error: {error_message}')
+        raise RuntimeError(error_message)
+
+    # Handle user-yt-video relation
+    response_bridge = await youtube_summary.link_user(user_id, created[0]['id'])
+
+    if not response_bridge:
+        error_message = 'Failed to link user and video.'
+        logger.error(f'Supabase bridge insert error: {error_message}')
+        raise RuntimeError(error_message)
+
+    logger.info('Data inserted successfully')
+
+    return {
+        "summary": video_summary,
+        "title": result['title'],
+        "transcript": transcript,
+        "video_id": created[0]['id']
+    }
+
+
+async def add_video_once(video_url: str, video_id: str, user_id: str) -> dict:
+    """
+    Adds a video, coalescing concurrent requests for the same video_id.
+
+    Only the first caller runs the pipeline; the others wait for it and are
+    then linked to the stored video themselves.
+    """
+    result, shared = await video_flight.do(video_id, lambda: add_video(video_url, video_id, user_id))
+
+    if shared:
+        response_bridge = await youtube_summary.link_user(user_id, result['video_id'])
+        if not response_bridge:
+            raise RuntimeError('Failed to link user and video.')
+        # The leader's ingest stored the vectors; reference them for this user too
+        await run_io(chunk_refs.share_refs, video_id, user_id)
+    return result
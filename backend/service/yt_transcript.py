@@ -2,8 +2,9 @@ from fastapi import HTTPException
 import httpx
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai #type: ignore
-import yt_dlp #type: ignore
+from service.summarizer import summarize
+from service.video_metadata import get_metadata
+from utils.http_client import http_clients, CircuitOpenError
 from utils.logger import logger
 import os
 from dotenv import load_dotenv
@@ -34,44 +35,6 @@ def extract_video_id(video_url: str) -> str:
         raise ValueError(f"Invalid YouTube URL: {e}")
 
 
-def get_video_metadata(video_url: str) -> dict:
-    """
-    Fetches the metadata for a YouTube video using yt-dlp.
-
-    Args:
-        video_url (str): The YouTube video URL.
-
-    Returns:
-        dict: A dictionary containing the video title and thumbnail URL.
-
-    Raises:
-        RuntimeError: If fetching metadata fails.
-    """
-
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    cookies_path = os.path.join(script_dir, 'cookies.txt')
-
-    ydl_opts = {
-        'quiet': True,
-        'cookiefile': cookies_path,
-        'username': os.getenv('YT_EMAIL'),
-        'password': os.getenv('YT_PASSWORD'),
-        'usenetrc': True
-    }
-
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(video_url, download=False)
-        title = info_dict.get('title', None)
-        thumbnail = info_dict.get('thumbnail', None)
-
-        if not title or not thumbnail:
-            raise RuntimeError("Failed to extract video metadata.")
-
-        return {
-            'title': title,
-            'thumbnail': thumbnail
-        }
-
 async def fetch_transcript_from_api(video_url: str) -> str:
     """
     Fetches the transcript from the new API.
@@ -85,20 +48,24 @@ async def fetch_transcript_from_api(video_url: str) -> str:
     Raises:
         RuntimeError: If fetching the transcript fails.
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
+    try:
+        response = await http_clients.request(
+            "tactiq",
+            "POST",
             "https://tactiq-apps-prod.tactiq.io/transcript",
             json={"videoUrl": video_url, "langCode": "en"},
             headers={"content-type": "application/json"},
         )
-        if response:
-            logger.info(f'{response}')
+    except CircuitOpenError:
+        raise RuntimeError("Transcript provider is unavailable, please retry later.")
+    if response:
+        logger.info(f'{response}')
 
-        transcript_data = response.json()
-        text_only = " ".join(
-            caption["text"] for caption in transcript_data.get("captions", [])
-        )
-        return text_only
+    transcript_data = response.json()
+    text_only = " ".join(
+        caption["text"] for caption in transcript_data.get("captions", [])
+    )
+    return text_only
 
 async def get_yt_transcript(video_url: str) -> dict:
     """
@@ -118,12 +85,12 @@ async def get_yt_transcript(video_url: str) -> dict:
     try:
         # Fetch the transcript from the new API
         transcript_text = await fetch_transcript_from_api(video_url)
-        summarized_text = yt_summarize(transcript_text)
+        summarized_text = await yt_summarize(transcript_text)
     except Exception as e:
         raise RuntimeError(f"Failed to fetch transcript: {e}")
 
-    # Fetch video metadata
-    metadata = get_video_metadata(video_url)
+    # Fetch video metadata (cached, off the event loop)
+    metadata = await get_metadata(video_id)
 
     return {
         'transcript': transcript_text,
@@ -133,51 +100,38 @@ async def get_yt_transcript(video_url: str) -> dict:
         'summary': summarized_text
     }
 
-def yt_summarize(transcript_text:str):
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(f'Summarize the text, covering every fact, sentences while preserving as much detail as possible: {transcript_text}')
-
-    return response.text
-
-async def addYoutubeTranscriptToVector(user_id: str, video_id: str, transcript: str):
-    url = f"{os.getenv('BACKEND_URL')}/ingestVideo"  # Ensure the environment variable is set correctly
-
-    # Use BytesIO to simulate the file upload in memory
-    data = {'user_id': user_id, 'video_id': video_id, 'transcript': transcript}
+async def yt_summarize(transcript_text:str):
+    """
+    Summarizes a transcript with Gemini.
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data)
-            response.raise_for_status()  # Raises an exception for 4xx/5xx responses
-    except httpx.HTTPStatusError as exc:
-        print(f"HTTP error occurred: {exc.response.status_code} - {exc.response.text}")
-    except httpx.RequestError as exc:
-        print(f"An error occurred while requesting {exc.request.url!r}: {exc}")
-    except Exception as exc:
-        print(f"An unexpected error occurred: {exc}")
-    else:
-        print("Transcript ingested successfully")
+    Long transcripts are summarized in parallel chunks and then reduced; see
+    service.summarizer.
+    """
+    return await summarize(transcript_text)
 
 async def fetch_transcript_from_supabase(video_url: str) -> dict:
     SUPABASE_API_KEY = os.environ.get("SUPABASE_KEY")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://uuqdokzuopkpbfyianvu.supabase.co/functions/v1/fetch_transcript",
-                json={"video_url": video_url},
-                headers={
-                    "content-type": "application/json",
-                    "Authorization": f"Bearer {SUPABASE_API_KEY}"     
-                    }
-            )
-
-            if response.status_code == 200:
-                logger.info(response)
-                return response.json()
-            else:
-                logger.error(f"Error fetching transcript: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=response.status_code, detail="Error fetching transcript")
+        response = await http_clients.request(
+            "supabase-functions",
+            "POST",
+            "https://uuqdokzuopkpbfyianvu.supabase.co/functions/v1/fetch_transcript",
+            json={"video_url": video_url},
+            headers={
+                "content-type": "application/json",
+                "Authorization": f"Bearer {SUPABASE_API_KEY}"     
+                }
+        )
+
+        if response.status_code == 200:
+            logger.info(response)
+            return response.json()
+        else:
+            logger.error(f"Error fetching transcript: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=response.status_code, detail="Error fetching transcript")
+    except CircuitOpenError:
+        logger.error("Transcript function circuit is open, failing fast")
+        raise HTTPException(status_code=503, detail="Transcript service is unavailable, please retry later")
     except httpx.RequestError as exc:
         logger.error(f"An error occurred while requesting {exc.request.url!r}: {exc}")
         raise HTTPException(status_code=500, detail="Error connecting to Supabase function")
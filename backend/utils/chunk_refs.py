@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences hash the same."""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_id: str, text: str) -> str:
+    """
+    Derives a deterministic vector ID for a chunk of a source.
+
+    The same chunk of the same video always maps to the same ID, so
+    re-ingesting or ingesting for another user overwrites instead of
+    duplicating.
+    """
+    return hashlib.sha256(f"{source_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()[:32]
+
+
+class ChunkRefs:
+    """
+    Records which chunks make up each source (video or file) for each user.
+
+    Vectors are stored once per (source, chunk); this table is what ties a
+    user to the sources they ingested and keeps the chunk order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_refs (
+                    source_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (source_id, user_id, position)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunk_refs_user ON chunk_refs (user_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS chunk_refs_chunk ON chunk_refs (chunk_id)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS source_versions (
+                    source_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def set_refs(self, source_id: str, user_id: str, chunk_ids: list) -> list:
+        """
+        Replaces the user's chunk list for a source and bumps the source's version.
+
+        Returns:
+            list: IDs from the user's previous list that no user references
+            any more, whose vectors can be deleted.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            previous = {
+                row["chunk_id"] for row in conn.execute(
+                    "SELECT chunk_id FROM chunk_refs WHERE source_id = ? AND user_id = ?", (source_id, user_id)
+                )
+            }
+            conn.execute("DELETE FROM chunk_refs WHERE source_id = ? AND user_id = ?", (source_id, user_id))
+            conn.executemany(
+                "INSERT INTO chunk_refs (source_id, user_id, position, chunk_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(source_id, user_id, position, cid, now) for position, cid in enumerate(chunk_ids)],
+            )
+            conn.execute(
+                """
+                INSERT INTO source_versions (source_id, version, updated_at) VALUES (?, 1, ?)
+                ON CONFLICT (source_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+                """,
+                (source_id, now),
+            )
+            # Chunk IDs are derived from the source, so only this source's refs can still use them
+            dropped = previous.difference(chunk_ids)
+            if dropped:
+                still_used = {
+                    row["chunk_id"] for row in conn.execute(
+                        "SELECT DISTINCT chunk_id FROM chunk_refs WHERE source_id = ?", (source_id,)
+                    )
+                }
+                dropped -= still_used
+            conn.execute("COMMIT")
+        return list(dropped)
+
+    def add_refs_if_missing(self, source_id: str, user_id: str, chunk_ids: list) -> bool:
+        """
+        Records the user's chunk list for a source unless they already have one.
+
+        Unlike `set_refs` the source's version is left alone, since its
+        content did not change. Returns whether refs were added.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(
+                "SELECT 1 FROM chunk_refs WHERE source_id = ? AND user_id = ? LIMIT 1", (source_id, user_id)
+            ).fetchone():
+                conn.execute("COMMIT")
+                return False
+            conn.executemany(
+                "INSERT INTO chunk_refs (source_id, user_id, position, chunk_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(source_id, user_id, position, cid, now) for position, cid in enumerate(chunk_ids)],
+            )
+            conn.execute("COMMIT")
+        return bool(chunk_ids)
+
+    def share_refs(self, source_id: str, user_id: str) -> bool:
+        """Gives a user linked to an already ingested source the chunk list of its latest ingest."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT user_id FROM chunk_refs WHERE source_id = ? ORDER BY created_at DESC LIMIT 1", (source_id,)
+            ).fetchone()
+            if not row:
+                return False
+            rows = conn.execute(
+                "SELECT chunk_id FROM chunk_refs WHERE source_id = ? AND user_id = ? ORDER BY position",
+                (source_id, row["user_id"]),
+            ).fetchall()
+        return self.add_refs_if_missing(source_id, user_id, [r["chunk_id"] for r in rows])
+
+    def source_version(self, source_id: str) -> int:
+        """Returns a counter that changes every time the source is (re-)ingested."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT version FROM source_versions WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        return row["version"] if row else 0
+
+    def sources_for_user(self, user_id: str) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT source_id FROM chunk_refs WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return [row["source_id"] for row in rows]
+
+    def chunk_ids_for_source(self, source_id: str) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT chunk_id FROM chunk_refs WHERE source_id = ?", (source_id,)
+            ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+    def positions(self, chunk_ids: list) -> dict:
+        """
+        Returns chunk_id -> position within its source.
+
+        Chunk IDs are derived from the source and the chunk text, so the
+        position is the same whichever user's refs it is read from.
+        """
+        if not chunk_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in chunk_ids)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT chunk_id, MIN(position) AS position FROM chunk_refs "
+                f"WHERE chunk_id IN ({placeholders}) GROUP BY chunk_id",
+                chunk_ids,
+            ).fetchall()
+        return {row["chunk_id"]: row["position"] for row in rows}
+
+
+chunk_refs = ChunkRefs(os.getenv("CHUNK_REFS_PATH", "./chroma_db/chunk_refs.db"))
@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from postgrest.exceptions import APIError #type: ignore
+from supabase import acreate_client, AsyncClient, AsyncClientOptions #type: ignore
+from utils.logger import logger
+
+load_dotenv()
+
+url: str = os.environ.get("SUPABASE_URL")
+# Must be the service-role (secret) key: the app has its own users and
+# sessions rather than Supabase Auth, so tables such as chat_messages and
+# note_fragments and the note RPCs are only granted to service_role.
+key: str = os.environ.get("SUPABASE_KEY")
+
+# Postgres error classes that mean the statement was rejected (and rolled
+# back): data exceptions and integrity constraint violations
+REJECTED_SQLSTATE_CLASSES = ("22", "23")
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def is_rejected(exc: Exception) -> bool:
+    """True if the database definitely refused the write, so nothing was committed."""
+    return isinstance(exc, APIError) and str(exc.code or "")[:2] in REJECTED_SQLSTATE_CLASSES
+
+
+def is_foreign_key_violation(exc: Exception) -> bool:
+    return isinstance(exc, APIError) and str(exc.code or "") == FOREIGN_KEY_VIOLATION
+
+
+def key_role(api_key: str):
+    """Returns the Postgres role a Supabase API key acts as, or None if it cannot tell."""
+    if not api_key:
+        return None
+    if api_key.startswith("sb_secret_"):
+        return "service_role"
+    if api_key.startswith("sb_publishable_"):
+        return "anon"
+    # Legacy keys are JWTs carrying the role as a claim
+    try:
+        payload = api_key.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return claims.get("role")
+    except (IndexError, ValueError):
+        return None
+
+
+class Database:
+    """
+    Application-lifetime async Supabase client.
+
+    One AsyncClient is shared by every request so its HTTP connection pool
+    (keep-alive connections to PostgREST) is reused. Calls are capped at
+    `max_concurrency` in flight and each one gets its own timeout.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.client: AsyncClient = None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self.in_flight = 0
+        self.timeouts = 0
+
+    async def connect(self):
+        async with self._lock:
+            if self.client is None:
+                role = key_role(key)
+                if role is not None and role != "service_role":
+                    raise RuntimeError(
+                        f"SUPABASE_KEY is a {role} key; the backend needs the service-role key"
+                    )
+                if role is None:
+                    logger.warning('Could not tell the role of SUPABASE_KEY; it must be the service-role key')
+                self.client = await acreate_client(
+                    url, key, options=AsyncClientOptions(postgrest_client_timeout=self.timeout)
+                )
+                logger.info('Connected async Supabase client')
+
+    def table(self, name: str):
+        if self.client is None:
+            raise RuntimeError("Database client is not connected; call db.connect() on startup.")
+        return self.client.table(name)
+
+    def rpc(self, name: str, params: dict):
+        if self.client is None:
+            raise RuntimeError("Database client is not connected; call db.connect() on startup.")
+        return self.client.rpc(name, params)
+
+    async def execute(self, query, timeout: float = None):
+        """
+        Executes a PostgREST query built from `db.table(...)` or `db.rpc(...)`.
+
+        Raises:
+            HTTPException: 504 if the call does not finish within the timeout.
+        """
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(query.execute(), timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error('Supabase request timed out')
+                raise HTTPException(status_code=504, detail="Database request timed out")
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "timeouts": self.timeouts,
+        }
+
+
+db = Database(
+    max_concurrency=int(os.getenv("DB_MAX_CONCURRENCY", 32)),
+    timeout=float(os.getenv("DB_TIMEOUT_SECONDS", 10)),
+)
@@ -0,0 +1,108 @@
+import asyncio
+from dotenv import load_dotenv
+from utils.executor import run_cpu
+from utils.logger import logger
+
+load_dotenv()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding calls into batched forward passes.
+
+    Callers from different requests submit texts and await their vectors.
+    A collector task gathers whatever arrives within `max_wait_ms` (or until
+    `max_batch_size` texts are waiting), embeds them in one call on the CPU
+    executor and hands each caller back its slice.
+    """
+
+    def __init__(self, embeddings, max_batch_size: int = 64, max_wait_ms: float = 5, max_concurrent_batches: int = 2):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batches = 0
+        self.texts = 0
+        self._queue = None
+        self._collector = None
+        self._slots = None
+        self._inflight = set()
+
+    def _ensure_started(self):
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._collector = asyncio.create_task(self._collect())
+
+    async def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def embed_query(self, text: str) -> list:
+        return (await self.embed_documents([text]))[0]
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Keep gathering until the batch is full or the wait window closes
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: list):
+        try:
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await run_cpu(self.embeddings.embed_documents, texts)
+            except Exception as e:
+                logger.error(f'Batched embedding of {len(texts)} texts failed: {str(e)}')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches += 1
+            self.texts += len(texts)
+
+            # Fan the vectors back out to the callers
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+        finally:
+            self._slots.release()
+
+    async def stop(self):
+        if self._collector:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, *self._inflight, return_exceptions=True)
+            self._collector = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import closing
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings #type: ignore
+from utils.chunk_refs import normalize_text
+from utils.logger import logger
+
+load_dotenv()
+
+
+class EmbeddingCache:
+    """
+    A disk-backed, size-bounded LRU cache of embedding vectors.
+
+    Vectors are stored as packed float32 blobs in SQLite, keyed by a hash of
+    the model name and the normalised text. When the stored bytes exceed
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_access)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Returns the cached vector for each text, or None where it is missing."""
+        keys = [self.key(model, text) for text in texts]
+        found = {}
+        with closing(self._connect()) as conn:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found]
+                )
+
+        vectors = []
+        for k in keys:
+            blob = found.get(k)
+            vectors.append(array("f", blob).tolist() if blob is not None else None)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return vectors
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        now = time.time()
+        # Texts that normalise to the same key collapse to one row
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            blob = array("f", vector).tobytes()
+            key = self.key(model, text)
+            rows[key] = (key, model, blob, len(blob), now)
+        keys = list(rows)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Replaced rows only change the total by their size difference
+            replaced = 0
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                replaced += conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchone()[0]
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows.values())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._bytes += sum(row[3] for row in rows.values()) - replaced
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every insert
+        target = int(self.max_bytes * 0.9)
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            evicted = 0
+            while total > target:
+                rows = conn.execute(
+                    "SELECT key, size FROM embeddings ORDER BY last_access LIMIT 1000"
+                ).fetchall()
+                if not rows:
+                    break
+                conn.executemany("DELETE FROM embeddings WHERE key = ?", [(row[0],) for row in rows])
+                total -= sum(row[1] for row in rows)
+                evicted += len(rows)
+        with self._lock:
+            self._bytes = total
+            self.evictions += evicted
+        logger.info(f'Evicted {evicted} cached embeddings')
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model so every vector goes through the cache first.
+
+    Only texts that miss the cache are sent to the model. Documents and
+    queries share entries, which holds for symmetric models such as
+    all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self.embeddings.embed_documents(missing_texts)
+            self.cache.put_many(self.model_name, missing_texts, computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+embedding_cache = EmbeddingCache(
+    path=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.db"),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+)
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from utils.logger import logger
+
+load_dotenv()
+
+
+class BoundedExecutor:
+    """
+    A thread pool with a cap on how much work may be queued behind it.
+
+    Blocking calls are handed to the pool so the event loop stays free. When
+    more than `max_pending` calls are already waiting for a worker, new calls
+    are rejected with a 503 instead of piling up behind a long-running ingest.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(max_workers)
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs a blocking callable on the pool and awaits its result.
+
+        Args:
+            func: The blocking callable.
+            *args, **kwargs: Arguments passed to the callable.
+
+        Returns:
+            The callable's return value.
+
+        Raises:
+            HTTPException: 503 if the pool's queue is full.
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f'{self.name} executor saturated ({self._pending} pending)')
+            raise HTTPException(status_code=503, detail="Server is busy, please retry shortly.")
+
+        queued_at = time.monotonic()
+        self._pending += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._pending -= 1
+
+        # Track how long callers wait for a worker
+        wait = time.monotonic() - queued_at
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+        finally:
+            self._running -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "running": self._running,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / self.completed * 1000 if self.completed else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# CPU-bound work (embedding). Kept small so the model does not oversubscribe cores.
+cpu_executor = BoundedExecutor(
+    "cpu",
+    max_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", os.cpu_count() or 2)),
+    max_pending=int(os.getenv("CPU_EXECUTOR_MAX_PENDING", 64)),
+)
+
+# Blocking network and disk I/O (Chroma, LLM calls).
+io_executor = BoundedExecutor(
+    "io",
+    max_workers=int(os.getenv("IO_EXECUTOR_WORKERS", 16)),
+    max_pending=int(os.getenv("IO_EXECUTOR_MAX_PENDING", 256)),
+)
+
+
+# Password hashing (bcrypt). Separate so a burst of logins cannot starve
+# embedding work, and vice versa.
+hash_executor = BoundedExecutor(
+    "hash",
+    max_workers=int(os.getenv("HASH_EXECUTOR_WORKERS", 4)),
+    max_pending=int(os.getenv("HASH_EXECUTOR_MAX_PENDING", 128)),
+)
+
+
+async def run_cpu(func, *args, **kwargs):
+    return await cpu_executor.run(func, *args, **kwargs)
+
+
+async def run_io(func, *args, **kwargs):
+    return await io_executor.run(func, *args, **kwargs)
+
+
+async def run_hash(func, *args, **kwargs):
+    return await hash_executor.run(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    cpu_executor.shutdown()
+    io_executor.shutdown()
+    hash_executor.shutdown()
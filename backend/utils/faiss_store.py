@@ -0,0 +1,462 @@
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+import faiss #type: ignore
+import numpy as np
+from utils.logger import logger
+
+INDEX_TYPES = ("ivfpq", "hnsw")
+
+# Metadata keys the app filters on; each gets an SQLite expression index
+INDEXED_KEYS = ("video_id", "file_id", "note_id", "user_id")
+
+# IVF-PQ needs enough vectors to train its coarse quantizer and codebooks;
+# smaller collections use a flat int8 index instead
+IVFPQ_MIN_VECTORS = 10000
+
+# Vectors used to train a new index, and vectors added to it per step
+TRAIN_SAMPLE_SIZE = 100000
+ADD_BATCH_SIZE = 50000
+
+# Rebuild from scratch once this share of the index points at deleted rows
+MAX_DELETED_RATIO = 0.2
+
+_KEY_PATTERN = re.compile(r'^\w+$')
+
+
+def quantize(vectors: np.ndarray) -> tuple:
+    """Scales each vector into int8 codes; returns the codes and per-vector scales."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def _column(key: str) -> str:
+    if not _KEY_PATTERN.match(key):
+        raise ValueError(f"Invalid metadata key {key!r}")
+    # Inlined rather than bound so SQLite can use the expression indexes
+    return f"json_extract(metadata, '$.{key}')"
+
+
+def where_sql(where: dict) -> tuple:
+    """
+    Translates the subset of Chroma's `where` filters the app uses to SQL.
+
+    Supports plain equality, `$eq`, `$ne`, `$in`, `$or` and `$and`.
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$or", "$and"):
+            parts = [where_sql(sub) for sub in condition]
+            joiner = " OR " if key == "$or" else " AND "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+
+        column = _column(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op == "$eq":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+            elif op == "$ne":
+                clauses.append(f"{column} != ?")
+                params.append(value)
+            elif op == "$in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' for _ in value)})")
+                params.extend(value)
+            else:
+                raise ValueError(f"Unsupported filter operator {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+
+class FaissCollection:
+    """
+    A FAISS-backed vector collection exposing the subset of Chroma's
+    collection API the app uses (get, upsert, delete, query, count).
+
+    Rows (ID, document, metadata and an int8 copy of the vector) live in
+    SQLite. Vectors are searched through a compressed FAISS index that is
+    written atomically and memory-mapped read-only, so every worker process
+    shares one copy through the page cache. Serving processes never build
+    indexes: `sync_index`, run by the index maintenance command, adds
+    pending rows to the existing index and only rebuilds it from scratch when
+    it has to be retrained. Rows added since the last sync are searched
+    exactly, and deleted rows are dropped from results until a rebuild
+    removes them from the index.
+    """
+
+    def __init__(self, path: str, name: str, index_type: str = "ivfpq", nlist: int = 1024, pq_m: int = 48,
+                 nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64, exact_limit: int = 2048,
+                 sync_min_pending: int = 2000, sync_ratio: float = 0.1):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {index_type!r}; expected one of {INDEX_TYPES}")
+        self.name = name
+        self.directory = os.path.join(path, name)
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.exact_limit = exact_limit
+        self.sync_min_pending = sync_min_pending
+        self.sync_ratio = sync_ratio
+        self.index_path = os.path.join(self.directory, "index.faiss")
+        self.db_path = os.path.join(self.directory, "vectors.db")
+        self._index = None
+        self._index_stamp = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vectors (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    document TEXT,
+                    metadata TEXT NOT NULL,
+                    code BLOB NOT NULL,
+                    scale REAL NOT NULL,
+                    indexed INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS vectors_pending ON vectors (indexed)")
+            for key in INDEXED_KEYS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS vectors_{key} ON vectors ({_column(key)})")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def upsert(self, ids: list, embeddings: list, documents: list = None, metadatas: list = None):
+        if not ids:
+            return
+        codes, scales = quantize(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Replaced rows get a new seq; the old one disappears from the index on the next rebuild
+            conn.execute(f"DELETE FROM vectors WHERE id IN ({', '.join('?' for _ in ids)})", list(ids))
+            conn.executemany(
+                "INSERT INTO vectors (id, document, metadata, code, scale) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (vector_id, document, json.dumps(metadata or {}), code.tobytes(), float(scale))
+                    for vector_id, document, metadata, code, scale in zip(ids, documents, metadatas, codes, scales)
+                ],
+            )
+            conn.execute("COMMIT")
+
+    def delete(self, ids: list = None, where: dict = None):
+        if ids is None and not where:
+            raise ValueError("delete needs ids or a where filter")
+        sql, params = self._filter(ids, where)
+        with closing(self._connect()) as conn:
+            conn.execute(f"DELETE FROM vectors WHERE {sql}", params)
+
+    def get(self, ids: list = None, where: dict = None, limit: int = None, offset: int = None,
+            include: list = ("metadatas", "documents")) -> dict:
+        sql, params = self._filter(ids, where)
+        query = f"SELECT id, document, metadata, code, scale FROM vectors WHERE {sql} ORDER BY seq"
+        if limit is not None or offset is not None:
+            query += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        embeddings = None
+        if "embeddings" in include:
+            embeddings = self._vectors(rows, 3).tolist() if rows else []
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[2]) for row in rows] if "metadatas" in include else None,
+            "embeddings": embeddings,
+        }
+
+    def query(self, query_embeddings: list, n_results: int = 10, where: dict = None,
+              include: list = ("metadatas", "documents", "distances")) -> dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        with closing(self._connect()) as conn:
+            for query in queries:
+                hits = self._search(conn, query, n_results, where)
+                seqs = [seq for seq, _ in hits]
+                rows = {}
+                if seqs:
+                    rows = {
+                        row[0]: row for row in conn.execute(
+                            f"SELECT seq, id, document, metadata, code, scale FROM vectors "
+                            f"WHERE seq IN ({', '.join('?' for _ in seqs)})",
+                            seqs,
+                        )
+                    }
+                ordered = [(rows[seq], distance) for seq, distance in hits if seq in rows]
+                results["ids"].append([row[1] for row, _ in ordered])
+                results["documents"].append([row[2] for row, _ in ordered])
+                results["metadatas"].append([json.loads(row[3]) for row, _ in ordered])
+                results["distances"].append([distance for _, distance in ordered])
+                if "embeddings" in include:
+                    rows_only = [row for row, _ in ordered]
+                    results["embeddings"].append(self._vectors(rows_only, 4).tolist() if rows_only else [])
+
+        for field in ("documents", "metadatas", "distances", "embeddings"):
+            if field not in include:
+                results[field] = None
+        return results
+
+    def _filter(self, ids: list, where: dict) -> tuple:
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({', '.join('?' for _ in ids)})" if ids else "0")
+            params.extend(ids)
+        if where:
+            sql, where_params = where_sql(where)
+            clauses.append(sql)
+            params.extend(where_params)
+        return " AND ".join(clauses) or "1", params
+
+    @staticmethod
+    def _vectors(rows: list, code_column: int) -> np.ndarray:
+        codes = np.stack([np.frombuffer(row[code_column], dtype=np.int8) for row in rows])
+        scales = np.array([row[code_column + 1] for row in rows], dtype=np.float32)
+        return dequantize(codes, scales)
+
+    @staticmethod
+    def _exact(query: np.ndarray, rows: list, k: int) -> list:
+        """Brute-force squared L2 over (seq, code, scale) rows."""
+        if not rows:
+            return []
+        vectors = FaissCollection._vectors(rows, 1)
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return [(rows[i][0], float(distances[i])) for i in order]
+
+    def _search(self, conn: sqlite3.Connection, query: np.ndarray, k: int, where: dict) -> list:
+        allowed = None
+        where_clause, params = "1", []
+        if where:
+            where_clause, params = where_sql(where)
+            allowed = [row[0] for row in conn.execute(f"SELECT seq FROM vectors WHERE {where_clause}", params)]
+            if not allowed:
+                return []
+            # A small partition is cheaper (and exact) to scan than to search through the index
+            if len(allowed) <= self.exact_limit:
+                rows = conn.execute(
+                    f"SELECT seq, code, scale FROM vectors WHERE {where_clause}", params
+                ).fetchall()
+                return self._exact(query, rows, k)
+
+        hits = {}
+        index = self._load_index()
+        if index is not None and index.ntotal:
+            selector = faiss.IDSelectorBatch(np.asarray(allowed, dtype=np.int64)) if allowed is not None else None
+            # Over-fetch to make up for rows deleted since the last build
+            _, seqs = index.search(
+                query[None, :], min(k * 2, index.ntotal), params=self._search_params(index, selector)
+            )
+            candidates = [int(seq) for seq in seqs[0] if seq >= 0]
+            if candidates:
+                # The index only shortlists: compressed (e.g. PQ) distances are not
+                # comparable with exact ones, so re-score candidates from the stored
+                # int8 codes. Deleted rows are no longer stored and drop out here.
+                rows = conn.execute(
+                    f"SELECT seq, code, scale FROM vectors WHERE seq IN ({', '.join('?' for _ in candidates)})",
+                    candidates,
+                ).fetchall()
+                hits.update(self._exact(query, rows, k))
+
+        # Rows written since the last sync are not in the index yet
+        pending = conn.execute(
+            f"SELECT seq, code, scale FROM vectors WHERE indexed = 0 AND {where_clause}", params
+        ).fetchall()
+        hits.update(self._exact(query, pending, k))
+
+        return sorted(hits.items(), key=lambda hit: hit[1])[:k]
+
+    def _search_params(self, index, selector):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def _load_index(self):
+        """Returns the current on-disk index, re-mapping it when another process rebuilt it."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if stamp != self._index_stamp:
+                self._index = self._map_index()
+                self._index_stamp = stamp
+            return self._index
+
+    def _map_index(self):
+        """
+        Memory-maps the index file so every worker shares one copy in the page cache.
+
+        IVF inverted lists are only mapped by IO_FLAG_MMAP (as OnDiskInvertedLists),
+        while flat and scalar-quantized codes need IO_FLAG_MMAP_IFC; the two
+        cannot be combined, so small collections that fell back to a flat
+        index are read a second time with the right flag.
+        """
+        try:
+            if self.index_type == "ivfpq":
+                index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                if faiss.try_extract_index_ivf(index) is not None:
+                    return index
+            return faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type can be mapped; fall back to reading it in
+            return faiss.read_index(self.index_path)
+
+    def _new_index(self, n: int, d: int):
+        if self.index_type == "hnsw":
+            inner = faiss.IndexHNSWSQ(d, faiss.ScalarQuantizer.QT_8bit, self.hnsw_m)
+        elif n >= IVFPQ_MIN_VECTORS:
+            nlist = max(1, min(self.nlist, n // 39))
+            # The number of sub-quantizers must divide the dimension
+            m = max(divisor for divisor in range(1, self.pq_m + 1) if d % divisor == 0)
+            inner = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, m, 8)
+        else:
+            inner = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+        return faiss.IndexIDMap(inner)
+
+    def _add_rows(self, conn: sqlite3.Connection, index, pending_only: bool) -> int:
+        """Adds rows to the index in bounded batches; returns the last seq added."""
+        last = 0
+        condition = "indexed = 0 AND " if pending_only else ""
+        while True:
+            rows = conn.execute(
+                f"SELECT seq, code, scale FROM vectors WHERE {condition}seq > ? ORDER BY seq LIMIT ?",
+                (last, ADD_BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                return last
+            index.add_with_ids(self._vectors(rows, 1), np.array([row[0] for row in rows], dtype=np.int64))
+            last = rows[-1][0]
+
+    def index_status(self) -> dict:
+        with closing(self._connect()) as conn:
+            pending = conn.execute("SELECT COUNT(*) FROM vectors WHERE indexed = 0").fetchone()[0]
+            indexed = conn.execute("SELECT COUNT(*) FROM vectors WHERE indexed = 1").fetchone()[0]
+        return {"pending": pending, "indexed": indexed}
+
+    def needs_sync(self) -> bool:
+        """True once the rows searched exactly are a meaningful share of the collection."""
+        status = self.index_status()
+        return status["pending"] >= max(self.sync_min_pending, self.sync_ratio * status["indexed"])
+
+    def _needs_rebuild(self, index, total: int) -> bool:
+        if index is None:
+            return True
+        if self.index_type == "ivfpq" and total >= IVFPQ_MIN_VECTORS:
+            # Outgrew the flat fallback; train IVF-PQ now that there is enough data
+            if not isinstance(faiss.downcast_index(index.index), faiss.IndexIVF):
+                return True
+        with closing(self._connect()) as conn:
+            indexed = conn.execute("SELECT COUNT(*) FROM vectors WHERE indexed = 1").fetchone()[0]
+        return index.ntotal - indexed > MAX_DELETED_RATIO * index.ntotal
+
+    def sync_index(self, full: bool = False):
+        """
+        Brings the index up to date with the stored rows.
+
+        Pending rows are added to the existing trained index. The index is
+        only rebuilt from scratch when there is none yet, when it has to be
+        retrained as a different type, when too many of its entries point at
+        deleted rows, or when `full` is set. Memory use is bounded by the
+        training sample and the add batch size, not the collection size.
+        Only one process syncs a collection at a time.
+
+        Returns:
+            str: "rebuilt", "updated" or "unchanged", or None if another
+            process holds the build lock.
+        """
+        with open(os.path.join(self.directory, "build.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            with closing(self._connect()) as conn:
+                total = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+                if not total:
+                    if os.path.exists(self.index_path):
+                        os.remove(self.index_path)
+                    return "rebuilt"
+
+                index = faiss.read_index(self.index_path) if os.path.exists(self.index_path) else None
+                if full or self._needs_rebuild(index, total):
+                    sample = conn.execute(
+                        "SELECT seq, code, scale FROM vectors ORDER BY random() LIMIT ?", (TRAIN_SAMPLE_SIZE,)
+                    ).fetchall()
+                    vectors = self._vectors(sample, 1)
+                    index = self._new_index(total, vectors.shape[1])
+                    index.train(vectors)
+                    last = self._add_rows(conn, index, pending_only=False)
+                    outcome = "rebuilt"
+                else:
+                    last = self._add_rows(conn, index, pending_only=True)
+                    if not last:
+                        return "unchanged"
+                    outcome = "updated"
+
+                temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                faiss.write_index(index, temp_path)
+                os.replace(temp_path, self.index_path)
+
+                # Rows written during the sync keep indexed = 0 and stay exactly searched
+                conn.execute("UPDATE vectors SET indexed = 1 WHERE indexed = 0 AND seq <= ?", (last,))
+
+            kind = type(faiss.downcast_index(index.index)).__name__
+            logger.info(f'FAISS index for {self.name} {outcome}: {index.ntotal} vectors, {kind}')
+            return outcome
+
+
+class FaissClient:
+    """Opens FAISS collections by name under one directory, like a Chroma client."""
+
+    def __init__(self, path: str, **settings):
+        self.path = path
+        self.settings = settings
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_or_create_collection(self, name: str) -> FaissCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FaissCollection(self.path, name, **self.settings)
+            return self._collections[name]
+
+    def list_collections(self) -> list:
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "vectors.db"))
+        )
@@ -1,4 +1,36 @@
-from fastapi import  Request
+from fastapi import Depends, HTTPException, Request
+from repositories import sessions, users
+from utils.executor import run_io
+from utils.session_cache import session_cache
+import time
 
 def get_session_token(request: Request):
-    return request.cookies.get("session-token")
\ No newline at end of file
+    return request.cookies.get("session-token")
+
+async def get_current_user(session_token: str = Depends(get_session_token)) -> dict:
+    """
+    FastAPI dependency that resolves the session cookie to the user record.
+
+    Served from the session cache when possible; otherwise the session and
+    user are loaded from the database and cached.
+    """
+    if not session_token:
+        raise HTTPException(status_code=401, detail="Session token is missing")
+
+    # The revocation check reads the shared SQLite file, so keep it off the event loop
+    user = await run_io(session_cache.get, session_token)
+    if user:
+        return user
+
+    # Stamped before the lookup, so a logout that lands during it still revokes the entry
+    loaded_at = time.time()
+    session = await sessions.get_by_token(session_token)
+    if not session:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+
+    user = await users.get_by_id(session['user_id'])
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+
+    session_cache.set(session_token, user, loaded_at)
+    return user
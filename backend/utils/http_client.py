@@ -0,0 +1,152 @@
+import asyncio
+import os
+import random
+import time
+import httpx
+from dotenv import load_dotenv
+from utils.logger import logger
+
+load_dotenv()
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails fast once an upstream keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are rejected for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError()
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    def release_trial(self):
+        """Ends a trial call that told us nothing about the upstream (e.g. it was cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class HttpClientRegistry:
+    """
+    Application-lifetime httpx clients, one per upstream service.
+
+    Each client keeps its own keep-alive pool (and HTTP/2 when the `h2`
+    package is installed), its own connection limits and its own circuit
+    breaker. `request` retries transient failures with jittered backoff.
+    """
+
+    def __init__(self, max_connections: int, max_keepalive: int, timeout: float,
+                 max_retries: int, failure_threshold: int, reset_timeout: float):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clients = {}
+        self._breakers = {}
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        if name not in self._clients:
+            self._clients[name] = httpx.AsyncClient(
+                http2=True, limits=self.limits, timeout=self.timeout
+            )
+            self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self._clients[name]
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends a request on the named client with retries and circuit breaking.
+
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open.
+            httpx.RequestError: If every attempt failed to connect or timed out.
+        """
+        client = self.client(name)
+        breaker = self._breakers[name]
+
+        for attempt in range(self.max_retries + 1):
+            breaker.before_call()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException) as exc:
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f'{name} request failed ({exc!r}), retrying')
+            except BaseException:
+                # Cancellation or a non-network error: leave the circuit as it is,
+                # but free the half-open trial slot for the next caller
+                breaker.release_trial()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    return response
+                logger.warning(f'{name} returned {response.status_code}, retrying')
+
+            # Exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, min(8.0, 0.25 * 2 ** attempt)))
+
+    def stats(self) -> dict:
+        return {
+            name: {"circuit": breaker.state, "consecutive_failures": breaker.failures}
+            for name, breaker in self._breakers.items()
+        }
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+        self._breakers = {}
+
+
+http_clients = HttpClientRegistry(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20)),
+    max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", 10)),
+    timeout=float(os.getenv("HTTP_TIMEOUT_SECONDS", 30)),
+    max_retries=int(os.getenv("HTTP_MAX_RETRIES", 2)),
+    failure_threshold=int(os.getenv("HTTP_CIRCUIT_FAILURE_THRESHOLD", 5)),
+    reset_timeout=float(os.getenv("HTTP_CIRCUIT_RESET_SECONDS", 30)),
+)
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from dotenv import load_dotenv
+from utils.executor import run_io
+from utils.logger import logger
+
+load_dotenv()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# How often idle workers delete finished jobs past their retention
+SWEEP_INTERVAL = 3600
+
+
+class JobQueue:
+    """
+    A persistent, prioritised job queue backed by a local SQLite file.
+
+    Jobs survive restarts: anything left `running` for longer than
+    `stale_after` seconds is put back in the queue on startup. A running job
+    renews its lease every third of that, so long jobs are never picked up
+    twice. Failed jobs are retried with exponential backoff until
+    `max_attempts` is reached. Succeeded and failed jobs are deleted
+    `retention` seconds after they finish. Several processes may share the
+    same file; claiming a job happens inside an exclusive transaction.
+    """
+
+    def __init__(self, path: str, workers: int = 2, poll_interval: float = 1.0, stale_after: float = 600,
+                 retention: float = 7 * 24 * 3600):
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self._last_sweep = 0.0
+        self._handlers = {}
+        self._on_failed = {}
+        self._tasks = []
+        self._wakeup = None
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    run_after REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    dedupe_key TEXT
+                )
+                """
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "dedupe_key" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (kind, dedupe_key) WHERE dedupe_key IS NOT NULL"
+            )
+
+    def register(self, kind: str, handler, on_failed=None):
+        """
+        Registers the coroutine function that processes jobs of `kind`.
+
+        The handler receives the job payload as a dict and may return a
+        JSON-serialisable result, which is stored on the job. `on_failed`, if
+        given, is awaited with the payload once the last attempt has failed,
+        so the job can release anything it owns (e.g. a spooled upload).
+        """
+        self._handlers[kind] = handler
+        if on_failed is not None:
+            self._on_failed[kind] = on_failed
+
+    # --- synchronous storage operations (run on the I/O executor) ---
+
+    def _enqueue(self, kind: str, payload: dict, priority: int, max_attempts: int, dedupe_key: str = None) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedupe_key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND dedupe_key = ? AND status = ? LIMIT 1",
+                    (kind, dedupe_key, QUEUED),
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row["id"]
+            conn.execute(
+                """
+                INSERT INTO jobs (id, kind, payload, priority, status, max_attempts, run_after, created_at, updated_at,
+                                  dedupe_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, kind, json.dumps(payload), priority, QUEUED, max_attempts, now, now, now, dedupe_key),
+            )
+            conn.execute("COMMIT")
+        return job_id
+
+    def _claim(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = ? AND run_after <= ?
+                ORDER BY priority DESC, created_at
+                LIMIT 1
+                """,
+                (QUEUED, now),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+            return dict(row) if row else None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, result):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (SUCCEEDED, json.dumps(result), time.time(), job_id),
+            )
+
+    def _fail(self, job: dict, error: str):
+        now = time.time()
+        attempts = job["attempts"] + 1
+        if attempts < job["max_attempts"]:
+            # Exponential backoff with jitter before the next attempt
+            delay = min(2 ** attempts, 300) * (0.5 + random.random())
+            status, run_after = QUEUED, now + delay
+        else:
+            status, run_after = FAILED, now
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                (status, error, run_after, now, job["id"]),
+            )
+        return status
+
+    def _get(self, job_id: str):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                """
+                SELECT id, kind, priority, status, attempts, max_attempts, result, error, created_at, updated_at
+                FROM jobs WHERE id = ?
+                """,
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _renew(self, job_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+            )
+
+    def _sweep(self) -> int:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention),
+            )
+            return cursor.rowcount
+
+    def _requeue_running(self) -> int:
+        # Only jobs that have not been touched for a while, so a process starting
+        # up does not steal jobs another live process is still working on.
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, now, RUNNING, now - self.stale_after),
+            )
+            return cursor.rowcount
+
+    # --- async API ---
+
+    async def enqueue(self, kind: str, payload: dict, priority: int = 0, max_attempts: int = 3,
+                      dedupe_key: str = None) -> str:
+        """
+        Adds a job to the queue.
+
+        Args:
+            kind (str): The handler name registered with `register`.
+            payload (dict): JSON-serialisable arguments for the handler.
+            priority (int): Higher values are processed first.
+            max_attempts (int): How many times to try before giving up.
+            dedupe_key (str): If a job of the same kind with this key is still
+                waiting to run, return its ID instead of adding another.
+
+        Returns:
+            str: The job ID.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job_id = await run_io(self._enqueue, kind, payload, priority, max_attempts, dedupe_key)
+        if self._wakeup:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str):
+        return await run_io(self._get, job_id)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                await run_io(self._renew, job_id)
+            except Exception as e:
+                logger.error(f'Failed to renew the lease of job {job_id}: {str(e)}')
+
+    async def _sweep_if_due(self):
+        if time.monotonic() - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = time.monotonic()
+        try:
+            deleted = await run_io(self._sweep)
+        except Exception as e:
+            logger.error(f'Failed to delete finished jobs: {str(e)}')
+            return
+        if deleted:
+            logger.info(f'Deleted {deleted} finished jobs')
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await run_io(self._claim)
+            except Exception as e:
+                logger.error(f'Job worker {index} failed to claim a job: {str(e)}')
+                job = None
+
+            if not job:
+                await self._sweep_if_due()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            handler = self._handlers.get(job["kind"])
+            try:
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+                heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+                try:
+                    result = await handler(json.loads(job["payload"]))
+                finally:
+                    heartbeat.cancel()
+                await run_io(self._finish, job["id"], result)
+                logger.info(f'Job {job["id"]} ({job["kind"]}) succeeded')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                status = await run_io(self._fail, job, str(e))
+                logger.error(f'Job {job["id"]} ({job["kind"]}) failed, now {status}: {str(e)}')
+                on_failed = self._on_failed.get(job["kind"])
+                if status == FAILED and on_failed is not None:
+                    try:
+                        await on_failed(json.loads(job["payload"]))
+                    except Exception as cleanup_error:
+                        logger.error(f'Cleanup after job {job["id"]} failed: {str(cleanup_error)}')
+
+    async def start(self):
+        """Re-queues interrupted jobs and starts the worker tasks."""
+        requeued = await run_io(self._requeue_running)
+        if requeued:
+            logger.info(f'Re-queued {requeued} interrupted jobs')
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f'Started {self.workers} job workers')
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_queue = JobQueue(
+    path=os.getenv("JOB_QUEUE_PATH", "./jobs/jobs.db"),
+    workers=int(os.getenv("INGEST_WORKERS", 2)),
+    stale_after=float(os.getenv("JOB_STALE_SECONDS", 600)),
+    retention=float(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600)),
+)
@@ -0,0 +1,112 @@
+import asyncio
+import multiprocessing
+import os
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+from utils.logger import logger
+
+load_dotenv()
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+def _init_worker(memory_limit_mb: int):
+    # Cap the worker's address space so one huge document cannot exhaust the host
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class ProcessPool:
+    """
+    A pool of worker processes for GIL-heavy parsing work.
+
+    Workers are spawned from a fresh interpreter rather than forked from the
+    API process, so they do not inherit the embedding model and vector store
+    mappings and the address-space cap only has to fit the parse itself.
+
+    Each task gets a wall-clock deadline enforced by the parent: a worker
+    stuck inside native code (where signals are not handled) is killed and
+    the pool is rebuilt for the next caller. The same happens when a worker
+    dies, for instance after hitting the memory cap.
+    """
+
+    def __init__(self, max_workers: int, timeout: int, memory_limit_mb: int):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.timeouts = 0
+        self.crashes = 0
+        self._pool = None
+        # One task per worker, so a task starts running as soon as it is
+        # submitted and its deadline never includes time spent queued
+        self._slots = asyncio.Semaphore(max_workers)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+            )
+        return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor, kill: bool = False):
+        if self._pool is pool:
+            self._pool = None
+        if kill:
+            # Tasks sharing the pool fail with BrokenProcessPool and are reported as crashes
+            for process in list((pool._processes or {}).values()):
+                process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args):
+        """
+        Runs a picklable, module-level function in a worker process.
+
+        Raises:
+            ParseTimeout: If the task runs longer than the pool's timeout.
+            RuntimeError: If the worker process crashed.
+        """
+        async with self._slots:
+            pool = self._get_pool()
+            try:
+                future = asyncio.wrap_future(pool.submit(func, *args))
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning(f'{func.__name__} timed out after {self.timeout}s, replacing parse workers')
+                self._discard(pool, kill=True)
+                raise ParseTimeout()
+            except (BrokenProcessPool, MemoryError) as e:
+                self.crashes += 1
+                logger.error(f'Parse worker failed in {func.__name__}: {e!r}')
+                if isinstance(e, BrokenProcessPool):
+                    self._discard(pool)
+                raise RuntimeError("Document parsing failed; the file may be too large or malformed.")
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "timeout": self.timeout,
+            "memory_limit_mb": self.memory_limit_mb,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+        }
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+parse_pool = ProcessPool(
+    max_workers=int(os.getenv("PARSE_WORKERS", os.cpu_count() or 2)),
+    timeout=int(os.getenv("PARSE_TIMEOUT_SECONDS", 120)),
+    memory_limit_mb=int(os.getenv("PARSE_MEMORY_LIMIT_MB", 1024)),
+)
@@ -0,0 +1,72 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class QuizStore:
+    """
+    Keeps every generated quiz set per video, numbered by version.
+
+    The latest version is what the quiz endpoint serves; older versions are
+    kept so a regenerated quiz never leaves a video without one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS quizzes (
+                    video_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    source_version INTEGER NOT NULL,
+                    questions TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, version)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def save(self, video_id: str, source_version: int, questions: list) -> int:
+        """Stores a new quiz set for the video and returns its version."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) AS version FROM quizzes WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            version = row["version"] + 1
+            conn.execute(
+                "INSERT INTO quizzes (video_id, version, source_version, questions, created_at) VALUES (?, ?, ?, ?, ?)",
+                (video_id, version, source_version, json.dumps(questions), time.time()),
+            )
+            conn.execute("COMMIT")
+        return version
+
+    def latest(self, video_id: str):
+        """Returns the newest quiz set for the video, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM quizzes WHERE video_id = ? ORDER BY version DESC LIMIT 1", (video_id,)
+            ).fetchone()
+        if not row:
+            return None
+        quiz = dict(row)
+        quiz["questions"] = json.loads(quiz["questions"])
+        return quiz
+
+
+quiz_store = QuizStore(os.getenv("QUIZ_STORE_PATH", "./quizzes/quizzes.db"))
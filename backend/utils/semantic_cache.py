@@ -0,0 +1,121 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _normalize(vector: list) -> list:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class SemanticCache:
+    """
+    Caches answers per video, keyed by the question's embedding.
+
+    A lookup hits when a cached question for the same video has cosine
+    similarity of at least `threshold` with the new one. Entries expire after
+    `ttl` seconds, are tied to the video's ingest version (so re-ingesting the
+    video invalidates them) and the least recently used entries are evicted
+    beyond `max_entries` overall.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int, max_entries_per_video: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_entries_per_video = max_entries_per_video
+        self.hits = 0
+        self.misses = 0
+        # (video_id, entry_id) -> (expires_at, normalized embedding, answer), in LRU order
+        self._entries = OrderedDict()
+        # video_id -> (version, entry IDs in LRU order), so a lookup only scans its own video
+        self._videos = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        del self._entries[key]
+        video_id, entry_id = key
+        _, entry_ids = self._videos[video_id]
+        del entry_ids[entry_id]
+        if not entry_ids:
+            del self._videos[video_id]
+
+    def _entries_for(self, video_id: str, version: int):
+        """Returns the video's entry IDs, dropping them first if the video was re-ingested."""
+        video = self._videos.get(video_id)
+        if video is not None and video[0] != version:
+            for entry_id in list(video[1]):
+                self._remove((video_id, entry_id))
+            video = None
+        return video[1] if video is not None else None
+
+    def get(self, video_id: str, version: int, embedding: list):
+        query = _normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            entry_ids = self._entries_for(video_id, version)
+            for entry_id in list(entry_ids or ()):
+                key = (video_id, entry_id)
+                expires_at, vector, _ = self._entries[key]
+                if expires_at < now:
+                    self._remove(key)
+                    continue
+                score = sum(a * b for a, b in zip(query, vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            entry_ids.move_to_end(best_key[1])
+            self.hits += 1
+            return self._entries[best_key][2]
+
+    def set(self, video_id: str, version: int, embedding: list, answer):
+        with self._lock:
+            entry_ids = self._entries_for(video_id, version)
+            if entry_ids is None:
+                entry_ids = OrderedDict()
+                self._videos[video_id] = (version, entry_ids)
+            self._next_id += 1
+            self._entries[(video_id, self._next_id)] = (time.monotonic() + self.ttl, _normalize(embedding), answer)
+            entry_ids[self._next_id] = None
+
+            # Bound the per-video scan as well as the overall size
+            while len(entry_ids) > self.max_entries_per_video:
+                self._remove((video_id, next(iter(entry_ids))))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, video_id: str):
+        with self._lock:
+            video = self._videos.get(video_id)
+            for entry_id in list(video[1]) if video is not None else ():
+                self._remove((video_id, entry_id))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+            }
+
+
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 3600)),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000)),
+)
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+
+class SessionCache:
+    """
+    A per-process TTL + LRU cache from session token to the joined user record.
+
+    Revocations (login, logout) are recorded in a SQLite file shared by every
+    worker process on the host. A cached entry is only served if its user
+    has not been revoked since it was cached, so a rotated token stops
+    working in all workers at once rather than after the TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, path: str):
+        self.cache = TTLCache(ttl, max_entries)
+        self.revoked_hits = 0
+        self.path = path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_revocations (
+                    user_id TEXT PRIMARY KEY,
+                    revoked_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _revoked_at(self, user_id: str) -> float:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT revoked_at FROM session_revocations WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def get(self, token: str):
+        entry = self.cache.get(token)
+        if entry is None:
+            return None
+        cached_at, user = entry
+        if self._revoked_at(user["id"]) >= cached_at:
+            self.revoked_hits += 1
+            return None
+        return user
+
+    def set(self, token: str, user: dict, loaded_at: float):
+        """Caches a user record; `loaded_at` is when its database lookup started."""
+        self.cache.set(token, (loaded_at, user))
+
+    def invalidate_user(self, user_id: str):
+        """Makes every worker stop serving cached sessions of this user."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO session_revocations (user_id, revoked_at) VALUES (?, ?)",
+                (str(user_id), time.time()),
+            )
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "ttl": self.cache.ttl, "revoked_hits": self.revoked_hits}
+
+
+session_cache = SessionCache(
+    ttl=float(os.getenv("SESSION_CACHE_TTL_SECONDS", 300)),
+    max_entries=int(os.getenv("SESSION_CACHE_MAX_ENTRIES", 10000)),
+    path=os.getenv("SESSION_REVOCATIONS_PATH", "./session_cache/revocations.db"),
+)
@@ -0,0 +1,164 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from utils.logger import logger
+
+SHARD_STRATEGIES = ("bucket", "source")
+
+
+class ShardRouter:
+    """
+    Routes each source's vectors to a shard collection.
+
+    With the "bucket" strategy a source is hashed into one of `buckets`
+    collections; with "source" every video or file gets its own collection.
+    Either way all chunks of a source live in one shard, so a query about a
+    source searches a collection whose size is bounded by the partition
+    rather than by the whole corpus.
+
+    Shards are opened lazily on first use and only the `max_open` most
+    recently used handles are kept. Vectors written before sharding stay in
+    the `legacy_name` collection until the rebalance command moves them.
+    """
+
+    def __init__(self, client, prefix: str, strategy: str = "bucket", buckets: int = 16,
+                 max_open: int = 64, legacy_name: str = None):
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy {strategy!r}; expected one of {SHARD_STRATEGIES}")
+        self.client = client
+        self.prefix = prefix
+        self.strategy = strategy
+        self.buckets = buckets
+        self.max_open = max_open
+        self.legacy_name = legacy_name
+        self._shard_pattern = re.compile(rf"{re.escape(prefix)}-(?:s-[0-9a-f]{{20}}|b\d+-\d{{4,}})")
+        self.loads = 0
+        self.hits = 0
+        self._open = OrderedDict()
+        self._legacy_empty = False
+        self._lock = threading.Lock()
+
+    def shard_name(self, source_id: str) -> str:
+        digest = hashlib.sha1(source_id.encode("utf-8")).hexdigest()
+        if self.strategy == "source":
+            return f"{self.prefix}-s-{digest[:20]}"
+        # The bucket count is part of the name, so resizing routes to fresh shards
+        return f"{self.prefix}-b{self.buckets}-{int(digest[:8], 16) % self.buckets:04d}"
+
+    def is_shard(self, name: str) -> bool:
+        """True for shards of either strategy and any bucket count, never for unrelated collections."""
+        return self._shard_pattern.fullmatch(name) is not None
+
+    def collection(self, name: str):
+        with self._lock:
+            handle = self._open.get(name)
+            if handle is not None:
+                self._open.move_to_end(name)
+                self.hits += 1
+                return handle
+
+        # Opening a shard touches disk, so do it outside the lock
+        handle = self.client.get_or_create_collection(name=name)
+        with self._lock:
+            self.loads += 1
+            self._open[name] = handle
+            self._open.move_to_end(name)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return handle
+
+    def for_source(self, source_id: str):
+        return self.collection(self.shard_name(source_id))
+
+    def group_by_shard(self, source_ids: list) -> dict:
+        """Returns shard name -> the given sources that live in it."""
+        groups = {}
+        for source_id in source_ids:
+            groups.setdefault(self.shard_name(source_id), []).append(source_id)
+        return groups
+
+    def collections_for(self, source_id: str) -> list:
+        """The source's shard, then the legacy collection while it still holds vectors."""
+        legacy = self.legacy()
+        return [self.for_source(source_id)] + ([legacy] if legacy is not None else [])
+
+    def legacy(self):
+        """Returns the pre-sharding collection while it still holds vectors, else None."""
+        if not self.legacy_name or self._legacy_empty:
+            return None
+        handle = self.collection(self.legacy_name)
+        if handle.count() == 0:
+            # Nothing is ever written there again, so stop checking
+            self._legacy_empty = True
+            return None
+        return handle
+
+    def rebalance(self, batch_size: int = 500, dry_run: bool = False) -> dict:
+        """
+        Moves every vector into the shard its source routes to.
+
+        Covers the legacy collection and shards left over from a different
+        strategy or bucket count. Safe to re-run: vectors are upserted under
+        their existing IDs before being deleted from the old collection.
+
+        Returns:
+            dict: The number of vectors scanned and moved.
+        """
+        # Chroma 0.6 lists names; older releases list collection objects
+        names = [getattr(c, "name", c) for c in self.client.list_collections()]
+        sources = [name for name in names if name == self.legacy_name or self.is_shard(name)]
+
+        scanned = moved = 0
+        for name in sources:
+            current = self.collection(name)
+            offset = 0
+            while True:
+                page = current.get(
+                    limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+                )
+                if not page["ids"]:
+                    break
+                scanned += len(page["ids"])
+
+                moves = {}
+                for i, metadata in enumerate(page["metadatas"]):
+                    source_id = (metadata or {}).get("video_id") or (metadata or {}).get("file_id")
+                    if source_id is None:
+                        continue
+                    target = self.shard_name(source_id)
+                    if target != name:
+                        moves.setdefault(target, []).append(i)
+
+                move_ids = [page["ids"][i] for rows in moves.values() for i in rows]
+                if not dry_run:
+                    for target, rows in moves.items():
+                        self.collection(target).upsert(
+                            ids=[page["ids"][i] for i in rows],
+                            embeddings=[page["embeddings"][i] for i in rows],
+                            documents=[page["documents"][i] for i in rows],
+                            metadatas=[page["metadatas"][i] for i in rows],
+                        )
+                    if move_ids:
+                        current.delete(ids=move_ids)
+                    # Deleted rows shift the remaining ones down
+                    offset += len(page["ids"]) - len(move_ids)
+                else:
+                    offset += len(page["ids"])
+                moved += len(move_ids)
+
+            logger.info(f'Rebalanced {name}: {moved} vectors moved so far')
+
+        self._legacy_empty = False
+        return {"scanned": scanned, "moved": moved}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "buckets": self.buckets if self.strategy == "bucket" else None,
+                "open_shards": len(self._open),
+                "max_open": self.max_open,
+                "loads": self.loads,
+                "hits": self.hits,
+            }
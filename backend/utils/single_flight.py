@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time; concurrent callers share it.
+
+    Failures matching `is_negative` (for example "this video has no
+    transcript") are remembered for `negative_ttl` seconds and re-raised to
+    later callers without running the computation again.
+    """
+
+    def __init__(self, negative_ttl: float = 0, is_negative=None):
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative or (lambda exc: False)
+        self.shared = 0
+        self.negative_hits = 0
+        self._inflight = {}
+        self._negative = {}
+
+    async def do(self, key: str, func):
+        """
+        Awaits `func()` for the key, or joins the call already in progress.
+
+        Returns:
+            tuple: The result and whether it was shared with another caller.
+        """
+        failure = self._negative.get(key)
+        if failure:
+            expires_at, exc = failure
+            if expires_at > time.monotonic():
+                self.negative_hits += 1
+                raise exc
+            del self._negative[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            # Shield so one caller disconnecting does not cancel the others' work
+            return await asyncio.shield(task), True
+
+        task = asyncio.create_task(func())
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task), False
+        except Exception as exc:
+            if self.negative_ttl and self.is_negative(exc):
+                now = time.monotonic()
+                # Drop expired failures so the table does not grow without bound
+                for stale in [k for k, (expires_at, _) in self._negative.items() if expires_at <= now]:
+                    del self._negative[stale]
+                self._negative[key] = (now + self.negative_ttl, exc)
+            raise
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "shared": self.shared,
+            "negative_entries": len(self._negative),
+            "negative_hits": self.negative_hits,
+        }
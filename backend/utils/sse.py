@@ -0,0 +1,10 @@
+import json
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format a Server-Sent Events message."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+from utils.chunk_refs import normalize_text
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+
+class SummaryCache:
+    """
+    Persists partial summaries keyed by model, prompt and chunk text.
+
+    Transcripts of the same video (or overlapping re-uploads) split into the
+    same chunks, so their map-stage summaries can be reused as-is. Recently
+    used summaries are also kept in memory. Stored summaries expire after
+    `ttl` seconds, and beyond `max_entries` rows the oldest are pruned.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int, memory_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = TTLCache(ttl, memory_entries)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS summaries_age ON summaries (created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def key(model: str, prompt: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        summary = self.memory.get(key)
+        if summary is None:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT summary FROM summaries WHERE key = ? AND created_at >= ?", (key, time.time() - self.ttl)
+                ).fetchone()
+            if row:
+                summary = row[0]
+                self.memory.set(key, summary)
+        if summary is not None:
+            self.hits += 1
+            return summary
+        self.misses += 1
+        return None
+
+    def set(self, key: str, summary: str):
+        self.memory.set(key, summary)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, summary, time.time()),
+            )
+            self._writes += 1
+            # Prune now and then rather than on every write
+            if self._writes % 100 == 0:
+                self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            """
+            DELETE FROM summaries WHERE key IN (
+                SELECT key FROM summaries ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "max_entries": self.max_entries,
+        }
+
+
+summary_cache = SummaryCache(
+    path=os.getenv("SUMMARY_CACHE_PATH", "./summary_cache/summaries.db"),
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+    max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 100000)),
+    memory_entries=int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", 1000)),
+)
@@ -0,0 +1,97 @@
+import fcntl
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_ENGINES = ("chroma", "faiss")
+
+
+def create_vector_client(engine: str, path: str = None):
+    """
+    Opens the vector store selected for this deployment.
+
+    Both engines hand out collections with the same interface (Chroma's
+    `get`, `upsert`, `delete`, `query` and `count`), so the shard router and
+    the ingest and query code do not depend on which one is in use.
+
+    Args:
+        engine (str): "chroma" or "faiss".
+        path (str): Where the store keeps its data; defaults per engine.
+
+    Returns:
+        A client with `get_or_create_collection(name)` and `list_collections()`.
+    """
+    if engine not in VECTOR_ENGINES:
+        raise ValueError(f"Unknown vector engine {engine!r}; expected one of {VECTOR_ENGINES}")
+
+    if engine == "faiss":
+        # Imported here so Chroma-only deployments never load FAISS, and vice versa
+        from utils.faiss_store import FaissClient
+        return FaissClient(
+            path or "./faiss_db",
+            index_type=os.getenv("FAISS_INDEX_TYPE", "ivfpq"),
+            nlist=int(os.getenv("FAISS_NLIST", 1024)),
+            pq_m=int(os.getenv("FAISS_PQ_M", 48)),
+            nprobe=int(os.getenv("FAISS_NPROBE", 16)),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", 32)),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", 64)),
+            exact_limit=int(os.getenv("FAISS_EXACT_LIMIT", 2048)),
+            sync_min_pending=int(os.getenv("FAISS_SYNC_MIN_PENDING", 2000)),
+            sync_ratio=float(os.getenv("FAISS_SYNC_RATIO", 0.1)),
+        )
+
+    import chromadb #type: ignore
+    from chromadb.config import Settings #type: ignore
+
+    # With a memory limit set, Chroma unloads the least recently used
+    # collection indexes once they exceed it
+    memory_limit_mb = int(os.getenv("VECTOR_MEMORY_LIMIT_MB", 0))
+    settings = Settings(
+        chroma_segment_cache_policy="LRU",
+        chroma_memory_limit_bytes=memory_limit_mb * 1024 * 1024,
+    ) if memory_limit_mb else Settings()
+    return chromadb.PersistentClient(path=path or "./chroma_db", settings=settings)
+
+
+class VectorStoreLock:
+    """
+    Keeps offline maintenance from writing to the store while the API uses it.
+
+    Every API process holds a shared lock on the file while it runs; the
+    rebalance command needs the exclusive lock, so it refuses to start while
+    any server is up, and a server refuses to start while a rebalance runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def _lock(self, mode: int, message: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(message)
+        self._file = lock_file
+
+    def acquire_shared(self):
+        """Taken by the API server for as long as it runs."""
+        self._lock(fcntl.LOCK_SH, f"A vector store rebalance is running (lock {self.path}); start the server after it finishes")
+
+    def acquire_exclusive(self):
+        """Taken by offline maintenance that rewrites collections."""
+        self._lock(fcntl.LOCK_EX, f"The vector store is in use (lock {self.path}); stop the API server before rebalancing")
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+vector_store_lock = VectorStoreLock(os.getenv("VECTOR_LOCK_PATH", "./vector_store.lock"))
@@ -0,0 +1,81 @@
+import asyncio
+from utils.db import db, is_rejected
+from utils.logger import logger
+
+
+class InsertBatcher:
+    """
+    Coalesces single-row inserts into one table into multi-row inserts.
+
+    Rows submitted within `max_wait_ms` of each other (up to `max_batch_size`)
+    are sent as one PostgREST bulk insert, and each caller gets back its own
+    inserted row.
+    """
+
+    def __init__(self, table: str, max_batch_size: int = 100, max_wait_ms: float = 10):
+        self.table = table
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._pending = []
+        self._flusher = None
+
+    async def insert(self, row: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_wait)
+        self._flusher = None
+        await self._flush(self._take())
+
+    def _flush_now(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        asyncio.create_task(self._flush(self._take()))
+
+    def _take(self) -> list:
+        batch, self._pending = self._pending, []
+        return batch
+
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        try:
+            response = await db.execute(db.table(self.table).insert([row for row, _ in batch]))
+        except Exception as e:
+            # A constraint or data error rolls the bulk insert back, so one bad
+            # row can be isolated by retrying rows one by one. Anything else
+            # (timeouts, 5xx) may have committed, and the rows have no
+            # idempotency key, so retrying could duplicate them.
+            if len(batch) > 1 and is_rejected(e):
+                logger.warning(f'Batched insert into {self.table} failed, retrying rows individually: {str(e)}')
+                await asyncio.gather(*(self._flush([item]) for item in batch))
+                return
+            logger.error(f'Insert into {self.table} failed: {str(e)}')
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        inserted = response.data or []
+        # PostgREST returns the inserted rows in the order they were sent
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(inserted[i] if i < len(inserted) else None)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "pending": len(self._pending),
+        }